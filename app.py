@@ -5,13 +5,24 @@ import tensorflow as tf
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import time
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from audio_io import load_audio, RESAMPLE_QUALITY, DEFAULT_QUALITY
+from fingerprint_index import FingerprintIndex, INDEX_DIR
+from model_tiers import select_tier, resolve
+from live_stream import (
+    LiveDetector, GrowingWavSource, FifoSource, SocketSource,
+    simulate_wav_stream, POLL_INTERVAL, IDLE_TIMEOUT
+)
 
 # ---------------- CONFIG ----------------
-MODEL_PATH = "model.h5"
-WIN_THRESH = 0.695
+WIN_THRESH = 0.695  # replaced by the selected model tier's threshold
 FILE_THRESH = 0.50
 WINDOW = 40
 HOP = 20
+BATCH = 8  # windows per model call for uploads (as in triage.py)
 SR = 16000
 
 # Spectrogram parameters
@@ -20,56 +31,57 @@ N_FFT = 2048
 HOP_LENGTH = 512
 FRAME_MS = 100  # Update spectrogram every 100ms
 
+UPLOAD_TYPES = ["wav", "flac", "ogg"]
+
 # ---------------- LOAD MODEL ----------------
 @st.cache_resource
-def load_model():
-    return tf.keras.models.load_model(MODEL_PATH)
+def load_model(path):
+    return tf.keras.models.load_model(path)
 
-model = load_model()
+@st.cache_resource
+def load_fingerprint_index():
+    if not os.path.isdir(INDEX_DIR):
+        return None
+    return FingerprintIndex(INDEX_DIR)
 
 # ---------------- AUDIO PROCESSING ----------------
-def extract_mel(path):
-    y, _ = librosa.load(path, sr=SR)
+def extract_mel(path, quality=None):
+    y, _ = load_audio(path, sr=SR, quality=quality)
     mel = librosa.feature.melspectrogram(
         y=y, sr=SR, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH
     )
     mel = librosa.power_to_db(mel, ref=np.max)
     return mel, y
 
-def predict_file(audio_path):
+def predict_file(audio_path, quality=None):
     """Returns overall score and per-window predictions with timestamps"""
-    mel, audio = extract_mel(audio_path)
+    mel, audio = extract_mel(audio_path, quality)
     T = mel.shape[1]
-    votes = []
-    window_scores = []
-    window_times = []
-    
+
     if T < WINDOW:
-        mel_padded = np.pad(mel, ((0,0),(0, WINDOW-T)))
-        mel_input = mel_padded[..., None][None, ...]
-        p = model.predict(mel_input, verbose=0)[0][0]
-        votes.append(p > WIN_THRESH)
-        window_scores.append(p)
-        window_times.append(0)
+        batch = np.pad(mel, ((0,0),(0, WINDOW-T)))[None, ..., None]
+        window_times = [0]
     else:
-        for i in range(0, T - WINDOW + 1, HOP):
-            win = mel[:, i:i+WINDOW]
-            win = win[..., None][None, ...]
-            p = model.predict(win, verbose=0)[0][0]
-            votes.append(p > WIN_THRESH)
-            window_scores.append(p)
-            # Calculate time in seconds for this window
-            time_sec = (i + WINDOW/2) * HOP_LENGTH / SR
-            window_times.append(time_sec)
-    
-    ratio = sum(votes) / len(votes)
-    return ratio, mel, window_scores, window_times, audio
+        starts = range(0, T - WINDOW + 1, HOP)
+        batch = np.stack([mel[:, i:i+WINDOW] for i in starts])[..., None]
+        # Time in seconds at the centre of each window
+        window_times = [(i + WINDOW/2) * HOP_LENGTH / SR for i in starts]
+
+    # fixed-size model calls: memory stays bounded for long uploads and the
+    # call matches the batch size the tier was selected for
+    batch = batch.astype(np.float32)
+    window_scores = np.concatenate([
+        np.asarray(model(batch[s:s+BATCH], training=False))[:, 0]
+        for s in range(0, len(batch), BATCH)
+    ])
+    ratio = float(np.mean(window_scores > WIN_THRESH))
+    return ratio, mel, list(window_scores), window_times, audio
 
-def create_spectrogram_with_overlay(mel, window_scores, window_times):
-    """Create interactive spectrogram with tampering overlay"""
+def create_spectrogram_with_overlay(mel, window_scores, window_times, t0=0.0):
+    """Create interactive spectrogram with tampering overlay (t0: time of first frame)"""
     # Time axis
-    duration = mel.shape[1] * HOP_LENGTH / SR
-    times = np.linspace(0, duration, mel.shape[1])
+    duration = t0 + mel.shape[1] * HOP_LENGTH / SR
+    times = np.linspace(t0, duration, mel.shape[1])
     
     # Frequency axis (Mel bins)
     freqs = librosa.mel_frequencies(n_mels=N_MELS, fmin=0, fmax=SR/2)
@@ -96,7 +108,7 @@ def create_spectrogram_with_overlay(mel, window_scores, window_times):
         if score > WIN_THRESH:
             # Calculate window boundaries
             window_duration = WINDOW * HOP_LENGTH / SR
-            time_start = max(0, time_center - window_duration/2)
+            time_start = max(t0, time_center - window_duration/2)
             time_end = min(duration, time_center + window_duration/2)
             
             # Color based on confidence
@@ -149,10 +161,91 @@ def create_spectrogram_with_overlay(mel, window_scores, window_times):
     
     return fig
 
+def run_live_monitor():
+    """Live mode: tails a PCM source and scores each window as it completes"""
+    st.subheader("📡 Live Monitor")
+    source_type = st.selectbox("Source", ["Growing WAV file", "FIFO (raw PCM)", "Socket (raw PCM)"])
+    if source_type == "Socket (raw PCM)":
+        target = st.text_input("host:port", "127.0.0.1:5000")
+    else:
+        target = st.text_input("Path", "live.wav" if source_type == "Growing WAV file" else "live.pcm")
+    simulate = None
+    if source_type == "Growing WAV file":
+        simulate = st.text_input("Simulate recorder from file (optional)", "")
+
+    if not st.button("▶️ Start monitoring", type="primary"):
+        return
+
+    if simulate:
+        if os.path.exists(target):
+            os.remove(target)
+        simulate_wav_stream(simulate, target)
+    if source_type == "Growing WAV file":
+        source = GrowingWavSource(target)
+    elif source_type == "FIFO (raw PCM)":
+        source = FifoSource(target)
+    else:
+        host, port = target.rsplit(":", 1)
+        source = SocketSource(host, int(port))
+
+    detector = LiveDetector(model, source, win_thresh=WIN_THRESH)
+    detector.warm_up()
+    st.caption(f"Latency budget per window: {detector.budget * 1000:.0f} ms · "
+               "press any other control to stop")
+    col1, col2 = st.columns([2, 1])
+    plot_slot = col1.empty()
+    stats_slot = col2.empty()
+
+    while not source.closed:
+        new = detector.poll()
+        if not new and detector.idle_seconds() > IDLE_TIMEOUT:
+            break
+        if new:
+            mel, t0 = detector.rolling_mel()
+            recent = [r for r in detector.results if r["time"] >= t0]
+            fig = create_spectrogram_with_overlay(
+                mel, [r["score"] for r in recent], [r["time"] for r in recent], t0=t0
+            )
+            plot_slot.plotly_chart(fig, use_container_width=True)
+
+            rep = detector.latency_report()
+            with stats_slot.container():
+                st.metric("Windows Scored", rep["windows"])
+                st.metric("Tampering Ratio", f"{detector.ratio():.1%}")
+                st.metric("Latency p95", f"{rep['p95'] * 1000:.0f} ms",
+                          delta=f"{(rep['p95'] - rep['budget']) * 1000:.0f} ms vs budget",
+                          delta_color="inverse")
+                st.caption(f"Over budget: {rep['over_budget']} · dropped: {rep['dropped']} · "
+                           f"model time/window: {rep['compute_mean'] * 1000:.1f} ms")
+        time.sleep(POLL_INTERVAL)
+    detector.finish()
+    st.success("Stream closed." if source.closed else f"No audio for {IDLE_TIMEOUT:.0f} s, monitoring stopped.")
+
 # ---------------- UI ----------------
 st.set_page_config(page_title="Audio Tampering Detection", layout="wide")
 st.title("🎧 Audio Tampering Detection with Real-Time Visualization")
 
+mode = st.sidebar.radio("Mode", ["Upload", "Live monitor"])
+resample_quality = st.sidebar.selectbox(
+    "Resampling quality", list(RESAMPLE_QUALITY), index=list(RESAMPLE_QUALITY).index(DEFAULT_QUALITY),
+    help="Only used when the file is not already 16 kHz"
+)
+
+# Model tier: most accurate model within the per-window latency budget.
+# Live windows are scored one at a time, uploads BATCH windows per call.
+budget_ms = st.sidebar.number_input(
+    "Latency budget per window (ms)", min_value=0.0, value=0.0, step=0.5,
+    help="0 = full model; otherwise the most accurate distilled tier that fits"
+)
+tier = select_tier(budget_ms or None, batch_size=1 if mode == "Live monitor" else BATCH)
+WIN_THRESH = tier["win_thresh"]
+model = load_model(resolve(tier))
+st.sidebar.caption(f"Model tier: **{tier['name']}** · window threshold {WIN_THRESH:.3f}")
+
+if mode == "Live monitor":
+    run_live_monitor()
+    st.stop()
+
 # Initialize session state
 if 'last_file' not in st.session_state:
     st.session_state.last_file = None
@@ -165,7 +258,7 @@ if 'results' not in st.session_state:
 col_left, col_center, col_right = st.columns([0.15, 0.7, 0.15])
 
 with col_center:
-    uploaded = st.file_uploader("Upload an audio file (.wav)", type=["wav"])
+    uploaded = st.file_uploader("Upload an audio file (.wav, .flac, .ogg)", type=UPLOAD_TYPES)
 
     if uploaded is not None:
         # Check if a new file was uploaded
@@ -175,11 +268,13 @@ with col_center:
             st.session_state.analyzed = False
             st.session_state.results = None
         
-        with open("temp.wav", "wb") as f:
+        # keep the original container so soundfile decodes it directly
+        temp_path = "temp" + os.path.splitext(uploaded.name)[1].lower()
+        with open(temp_path, "wb") as f:
             f.write(uploaded.read())
 
         # Audio player
-        st.audio("temp.wav")
+        st.audio(temp_path)
 
         # Dynamic button text
         button_text = "🔍 Analyze Audio" if not st.session_state.analyzed else "🔄 Analyze Again"
@@ -197,7 +292,7 @@ with col_center:
             progress_bar.progress(30)
             
             # Process audio
-            score, mel, window_scores, window_times, audio = predict_file("temp.wav")
+            score, mel, window_scores, window_times, audio = predict_file(temp_path, resample_quality)
             st.session_state.analyzed = True
             
             status_text.text("🔄 Running tampering detection on each frame...")
@@ -246,11 +341,11 @@ if uploaded is not None:
             st.plotly_chart(fig, use_container_width=True)
             
             # Legend
-            st.markdown("""
+            st.markdown(f"""
             **Legend:**
             - 🟦 **Blue-Green-Yellow**: Spectrogram amplitude (dB scale)
             - 🟥 **Red overlay**: High tampering confidence (>80%)
-            - 🟨 **Yellow overlay**: Moderate tampering confidence (69.5-80%)
+            - 🟨 **Yellow overlay**: Moderate tampering confidence ({WIN_THRESH:.1%}-80%)
             """)
         
         with col2:
@@ -306,16 +401,37 @@ if uploaded is not None:
                 No significant tampering detected. The audio appears authentic and unedited.
                 """)
         
+        # Cross-file splicing check against the corpus fingerprint index
+        fp_index = load_fingerprint_index()
+        if fp_index is not None:
+            st.subheader("🔗 Matching Material in Corpus")
+            t0 = time.perf_counter()
+            fp_index.refresh()  # pick up clips added through the CLI since the app started
+            matches = fp_index.query(temp_path)
+            st.caption(f"Fingerprint lookup took {(time.perf_counter() - t0) * 1000:.0f} ms")
+            if matches:
+                st.dataframe(
+                    [{
+                        "File": m["file"],
+                        "Offset in file (s)": round(m["offset"], 2),
+                        "Query span (s)": f"{m['query_start']:.2f} – {m['query_end']:.2f}",
+                        "Aligned hashes": m["hits"],
+                    } for m in matches],
+                    use_container_width=True
+                )
+            else:
+                st.write("No segment of this file was found elsewhere in the corpus.")
+        
         st.divider()
 
 else:
-    st.info("👆 Upload a .wav audio file to begin analysis")
+    st.info("👆 Upload a .wav, .flac or .ogg audio file to begin analysis")
     
     # Instructions
     with st.expander("ℹ️ How to use"):
         st.markdown("""
         ### Instructions:
-        1. **Upload** a `.wav` audio file using the file uploader above
+        1. **Upload** a `.wav`, `.flac` or `.ogg` audio file using the file uploader above
         2. **Listen** to the audio using the built-in player
         3. **Click "Analyze Audio"** to start the tampering detection
         4. **View** the real-time Mel spectrogram with tampering overlay
@@ -0,0 +1,50 @@
+import os
+import numpy as np
+import librosa
+import soundfile as sf
+
+SR = 16000
+AUDIO_EXTS = (".wav", ".flac", ".ogg")
+
+# Resampler per quality tier; only used when the file rate differs from the
+# requested one. Override the default with AUDIO_RESAMPLE_QUALITY=fast|hq.
+RESAMPLE_QUALITY = {
+    "fast": "soxr_lq",
+    "hq": "soxr_hq",
+}
+DEFAULT_QUALITY = os.environ.get("AUDIO_RESAMPLE_QUALITY", "hq")
+
+
+def load_audio(path, sr=SR, mono=True, quality=None):
+    """
+    Decodes an audio file to float32, like librosa.load(path, sr=sr, mono=mono).
+
+    Samples are read by soundfile straight into a float32 buffer sized from
+    the header. Resampling is skipped when the file is already at `sr` (or
+    sr is None), otherwise done with the resampler of the `quality` tier.
+    Returns (y, sr); y is (n,) when mono, else (channels, n).
+    """
+    quality = quality or DEFAULT_QUALITY
+    if quality not in RESAMPLE_QUALITY:
+        raise ValueError(f"unknown resample quality {quality!r}, expected one of {list(RESAMPLE_QUALITY)}")
+
+    try:
+        with sf.SoundFile(path) as f:
+            native_sr = f.samplerate
+            buf = np.empty((f.frames, f.channels), dtype=np.float32)
+            buf = f.read(out=buf)   # truncated view if the header over-reports
+    except RuntimeError:
+        # formats libsndfile cannot decode go through librosa's fallback
+        y, native_sr = librosa.load(path, sr=None, mono=False, dtype=np.float32)
+        buf = np.atleast_2d(y).T
+
+    if mono:
+        y = buf[:, 0] if buf.shape[1] == 1 else buf.mean(axis=1, dtype=np.float32)
+    else:
+        y = buf.T
+
+    if sr is None or sr == native_sr:
+        return y, native_sr
+
+    y = librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type=RESAMPLE_QUALITY[quality])
+    return y.astype(np.float32, copy=False), sr
@@ -0,0 +1,62 @@
+import os
+import time
+import argparse
+import librosa
+import numpy as np
+
+from audio_io import load_audio, RESAMPLE_QUALITY, AUDIO_EXTS, SR
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIR = os.path.join(BASE_DIR, "..", "data", "authentic")
+
+# Decode + resample cost per hour of audio:
+#   librosa.load       the old decode path at the file's own rate (librosa
+#                      skips resampling when the rates match, so this row is
+#                      soundfile/audioread decoding plus its float handling,
+#                      not a resampling cost)
+#   native             load_audio decoding at the file's own rate
+#   <tier>@<rate>      load_audio resampling to a mismatched rate per tier
+
+
+def list_audio(root, limit):
+    files = sorted(os.path.join(root, f) for f in os.listdir(root) if f.lower().endswith(AUDIO_EXTS))
+    return files[:limit] if limit else files
+
+
+def bench(name, fn, files, repeats):
+    best = np.inf
+    audio_sec = 0.0
+    for _ in range(repeats):
+        audio_sec = 0.0
+        t0 = time.perf_counter()
+        for path in files:
+            y, sr = fn(path)
+            audio_sec += y.shape[-1] / sr
+        best = min(best, time.perf_counter() - t0)
+    per_hour = best / audio_sec * 3600
+    print(f"{name:<22} {best:8.2f}s for {audio_sec / 60:6.1f} min  →  {per_hour:7.1f} s per audio-hour")
+    return per_hour
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decoding and resampling tiers")
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    parser.add_argument("--limit", type=int, default=0, help="max files (0 = all)")
+    parser.add_argument("--target-sr", type=int, default=22050,
+                        help="mismatched rate used to exercise the resamplers")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    files = list_audio(args.dir, args.limit)
+    print(f"{len(files)} files from {args.dir}\n")
+
+    bench("librosa.load (decode)", lambda p: librosa.load(p, sr=SR), files, args.repeats)
+    bench("native", lambda p: load_audio(p, sr=SR), files, args.repeats)
+    for tier in RESAMPLE_QUALITY:
+        bench(f"{tier}@{args.target_sr}",
+              lambda p, tier=tier: load_audio(p, sr=args.target_sr, quality=tier),
+              files, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import os
+# latency is reported for CPU deployment
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import json
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+from collections import defaultdict
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import (
+    Input, Conv2D, SeparableConv2D, MaxPooling2D, AveragePooling2D,
+    Dense, Dropout, GlobalAveragePooling2D
+)
+from tensorflow.keras.optimizers import Adam
+
+from train_cnn import (
+    load_files, window_starts, cut_window, assign_folds, youden_threshold, build_model,
+    WINDOW, FILE_THRESH
+)
+from model_tiers import ROOT_DIR, TIERS_PATH, DEFAULT_TIER
+from triage import BATCH as TRIAGE_BATCH
+
+TEACHER_PATH = os.path.join(ROOT_DIR, "model.h5")
+STUDENT_DIR = os.path.join(ROOT_DIR, "models")
+
+N_MELS = 128
+TEMPERATURE = 2.0    # softens teacher scores before fitting
+SOFT_WEIGHT = 0.7    # target = SOFT_WEIGHT * teacher + (1 - SOFT_WEIGHT) * label
+TRIAGE_SPEEDUP = 5.0     # triage tier must be this much faster than the teacher (at triage's batch size)...
+MAX_ACC_DROP = 0.05      # ...and lose at most this much file-level accuracy
+
+# -------------------------------------------------
+# STUDENT ARCHITECTURES
+# -------------------------------------------------
+# Every student takes the same (128, WINDOW, 1) window as the teacher, so the
+# app and scanners can swap tiers without touching feature extraction.
+# Reduced mel resolution is done in-graph by averaging adjacent mel bands.
+
+def student_sep():
+    """Depthwise-separable version of the teacher at full resolution"""
+    return Sequential([
+        Input((N_MELS, WINDOW, 1)),
+        Conv2D(16, (3,3), strides=(2,1), activation="relu"),
+        SeparableConv2D(32, (3,3), activation="relu"),
+        MaxPooling2D((2,2)),
+        SeparableConv2D(64, (3,3), activation="relu"),
+        GlobalAveragePooling2D(),
+        Dense(32, activation="relu"),
+        Dropout(0.3),
+        Dense(1, activation="sigmoid")
+    ])
+
+
+def student_sep_mel32():
+    """Separable convs on a 32-band mel input"""
+    return Sequential([
+        Input((N_MELS, WINDOW, 1)),
+        AveragePooling2D((4,1)),
+        Conv2D(16, (3,3), activation="relu"),
+        MaxPooling2D((2,2)),
+        SeparableConv2D(32, (3,3), activation="relu"),
+        GlobalAveragePooling2D(),
+        Dense(16, activation="relu"),
+        Dense(1, activation="sigmoid")
+    ])
+
+
+def student_tiny():
+    """32 mel bands × 20 frames, two narrow conv layers"""
+    return Sequential([
+        Input((N_MELS, WINDOW, 1)),
+        AveragePooling2D((4,2)),
+        Conv2D(8, (3,3), activation="relu"),
+        MaxPooling2D((2,2)),
+        SeparableConv2D(16, (3,3), activation="relu"),
+        GlobalAveragePooling2D(),
+        Dense(1, activation="sigmoid")
+    ])
+
+
+STUDENTS = {
+    "sep": student_sep,
+    "sep_mel32": student_sep_mel32,
+    "tiny": student_tiny,
+}
+
+# -------------------------------------------------
+# DATA
+# -------------------------------------------------
+def windows_for(files):
+    X, y, owner = [], [], []
+    for i, (_, mel, label, _) in enumerate(files):
+        for start in window_starts(mel.shape[1]):
+            X.append(cut_window(mel, start))
+            y.append(label)
+            owner.append(i)
+    return np.array(X, dtype=np.float32)[..., np.newaxis], np.array(y), np.array(owner)
+
+
+def soften(p, T=TEMPERATURE):
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    return 1.0 / (1.0 + np.exp(-np.log(p / (1 - p)) / T))
+
+
+def file_accuracy(model, X, owner, labels, thresh):
+    probs = np.asarray(model.predict(X, batch_size=256, verbose=0)).flatten()
+    votes = defaultdict(list)
+    for f, p in zip(owner, probs):
+        votes[f].append(p > thresh)
+    y_pred = [int(np.mean(v) >= FILE_THRESH) for v in votes.values()]
+    y_true = [labels[f] for f in votes]
+    return accuracy_score(y_true, y_pred)
+
+# -------------------------------------------------
+# LATENCY
+# -------------------------------------------------
+def measure_latency(model, batch_size, repeats=50):
+    """
+    Median wall-clock ms per eager model(x, training=False) call on CPU,
+    from a numpy batch: the call the app, live detector and triage make.
+    """
+    x = np.random.randn(batch_size, N_MELS, WINDOW, 1).astype(np.float32)
+    for _ in range(5):
+        model(x, training=False)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        np.asarray(model(x, training=False))
+        times.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(times))
+
+
+def tier_entry(name, path, model, thresh, acc):
+    b1 = measure_latency(model, 1)
+    b8 = measure_latency(model, TRIAGE_BATCH)
+    b256 = measure_latency(model, 256, repeats=10)
+    return {
+        "name": name,
+        "path": os.path.relpath(path, ROOT_DIR).replace(os.sep, "/"),
+        "win_thresh": float(thresh),
+        "file_acc": float(acc),
+        "params": int(model.count_params()),
+        "latency_b1_ms": b1,
+        f"per_window_b{TRIAGE_BATCH}_ms": b8 / TRIAGE_BATCH,
+        "latency_b256_ms": b256,
+        "per_window_b256_ms": b256 / 256,
+    }
+
+# -------------------------------------------------
+# DISTILLATION
+# -------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Distill compact student models from the window CNN")
+    parser.add_argument("--students", nargs="+", choices=list(STUDENTS), default=list(STUDENTS))
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--teacher-epochs", type=int, default=15,
+                        help="epochs for the teacher, retrained without the test fold")
+    parser.add_argument("--threads", type=int, default=1, help="CPU threads for latency measurement")
+    args = parser.parse_args()
+
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    tf.keras.utils.set_random_seed(42)
+
+    deployed = tf.keras.models.load_model(TEACHER_PATH)
+
+    # hold out one base-clip-grouped fold for file-level accuracy
+    files = load_files()
+    folds = assign_folds([f[0] for f in files], 5)
+    train_files = [f for f, k in zip(files, folds) if k != 0]
+    test_files = [f for f, k in zip(files, folds) if k == 0]
+    test_labels = [f[2] for f in test_files]
+    print("Train files:", len(train_files), " Test files:", len(test_files))
+
+    X_all, y_all, _ = windows_for(train_files)
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_all, y_all, test_size=0.2, stratify=y_all, random_state=42
+    )
+    X_test, _, owner_test = windows_for(test_files)
+
+    # model.h5 was trained on a random file split that overlaps fold 0, so
+    # neither its accuracy there nor its scores as distillation targets are
+    # clean. The teacher is the same architecture retrained on folds 1-4, and
+    # both the baseline and every student only ever see those folds.
+    teacher = build_model()
+    teacher.fit(X_train, y_train, epochs=args.teacher_epochs, batch_size=32,
+                validation_data=(X_val, y_val), verbose=0)
+    teacher_thresh = youden_threshold(y_val, teacher.predict(X_val, batch_size=256, verbose=0).flatten())
+    teacher_acc = file_accuracy(teacher, X_test, owner_test, test_labels, teacher_thresh)
+    print(f"✔ teacher retrained on folds 1-4: file acc {teacher_acc:.3f} at WIN_THRESH={teacher_thresh:.3f}")
+
+    # teacher window scores become the (softened) training targets
+    teacher_train = teacher.predict(X_train, batch_size=256, verbose=0).flatten()
+    targets = SOFT_WEIGHT * soften(teacher_train) + (1 - SOFT_WEIGHT) * y_train
+
+    # the "full" tier still serves model.h5 (its latency and threshold); its
+    # accuracy is the retrained teacher's, stored with the threshold it used
+    full = tier_entry("full", TEACHER_PATH, deployed, DEFAULT_TIER["win_thresh"], teacher_acc)
+    full["file_acc_model"] = "same architecture retrained on folds 1-4"
+    full["file_acc_win_thresh"] = float(teacher_thresh)
+    tiers = [full]
+
+    os.makedirs(STUDENT_DIR, exist_ok=True)
+    for name in args.students:
+        model = STUDENTS[name]()
+        model.compile(optimizer=Adam(0.001), loss="binary_crossentropy")
+        model.fit(X_train, targets, epochs=args.epochs, batch_size=64,
+                  validation_data=(X_val, y_val), verbose=0)
+
+        thresh = youden_threshold(y_val, model.predict(X_val, batch_size=256, verbose=0).flatten())
+        acc = file_accuracy(model, X_test, owner_test, test_labels, thresh)
+
+        path = os.path.join(STUDENT_DIR, f"student_{name}.h5")
+        model.save(path)
+        tiers.append(tier_entry(name, path, model, thresh, acc))
+        print(f"✔ trained student '{name}'")
+
+    full = tiers[0]
+    for t in tiers:
+        t["speedup_b1"] = full["latency_b1_ms"] / t["latency_b1_ms"]
+        t["speedup_b256"] = full["latency_b256_ms"] / t["latency_b256_ms"]
+        t["speedup_triage"] = full[f"per_window_b{TRIAGE_BATCH}_ms"] / t[f"per_window_b{TRIAGE_BATCH}_ms"]
+        t["triage"] = (t["name"] != "full"
+                       and t["speedup_triage"] >= TRIAGE_SPEEDUP
+                       and full["file_acc"] - t["file_acc"] <= MAX_ACC_DROP)
+
+    with open(TIERS_PATH, "w") as f:
+        json.dump(tiers, f, indent=2)
+
+    print(f"\n{'tier':<10} {'params':>8} {'file acc':>9} {'Δacc':>7} "
+          f"{'b1 ms':>7} {'b256 ms':>8} {'ms/win':>7} {'speedup':>8}  triage")
+    for t in tiers:
+        print(f"{t['name']:<10} {t['params']:>8} {t['file_acc']:>9.3f} {t['file_acc'] - full['file_acc']:>+7.3f} "
+              f"{t['latency_b1_ms']:>7.2f} {t['latency_b256_ms']:>8.1f} {t['per_window_b256_ms']:>7.3f} "
+              f"{t['speedup_b256']:>7.1f}x  {'✔' if t['triage'] else ''}")
+    print("\nTiers written to", TIERS_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import os
 import csv
+import json
+import hashlib
+import argparse
 import librosa
 import numpy as np
+from audio_io import load_audio
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 CSV_PATH = os.path.join(BASE_DIR, "..", "data", "dataset.csv")
 FEATURE_DIR = os.path.join(BASE_DIR, "..", "data", "features")
-
-os.makedirs(FEATURE_DIR, exist_ok=True)
+STFT_CACHE_DIR = os.path.join(BASE_DIR, "..", "data", "stft_cache")
 
 # Mel parameters (for CNN-friendly input)
 SR = 16000
@@ -16,18 +19,23 @@ N_MELS = 128
 N_FFT = 2048
 HOP_LENGTH = 512
 TARGET_FRAMES = 300  # fixed time dimension
+TOP_DB = 80.0
+AMIN = 1e-10
+
+def power_spectrogram(y, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    # same STFT (centered, hann) and power=2 as librosa.feature.melspectrogram
+    return np.abs(librosa.stft(y=y, n_fft=n_fft, hop_length=hop_length)) ** 2
+
+def extract_power(path, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    y, sr = load_audio(path, sr=SR)
+    return power_spectrogram(y, n_fft, hop_length)
+
+def mel_db_from_power(S):
+    mel = librosa.feature.melspectrogram(S=S, sr=SR, n_fft=N_FFT, n_mels=N_MELS)
+    return librosa.power_to_db(mel, ref=np.max)
 
 def extract_mel(path):
-    y, sr = librosa.load(path, sr=SR)
-    mel = librosa.feature.melspectrogram(
-        y=y,
-        sr=sr,
-        n_fft=N_FFT,
-        hop_length=HOP_LENGTH,
-        n_mels=N_MELS
-    )
-    mel_db = librosa.power_to_db(mel, ref=np.max)
-    return mel_db
+    return mel_db_from_power(extract_power(path))
 
 def pad_or_trim(mel):
     if mel.shape[1] < TARGET_FRAMES:
@@ -37,16 +45,208 @@ def pad_or_trim(mel):
         mel = mel[:, :TARGET_FRAMES]
     return mel
 
-with open(CSV_PATH, "r") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        audio_path = os.path.join(BASE_DIR, "..", row["filepath"])
-        mel = extract_mel(audio_path)
-        mel = pad_or_trim(mel)
+def extract_file(audio_path, out_path):
+    mel = extract_mel(audio_path)
+    mel = pad_or_trim(mel)
+    np.save(out_path, mel)
+
+
+def feature_path(audio_path, feature_dir=FEATURE_DIR):
+    name = os.path.splitext(os.path.basename(audio_path))[0]
+    return os.path.join(feature_dir, name + ".npy")
+
+# -------------------------------------------------
+# STFT POWER CACHE
+# -------------------------------------------------
+# One directory per (SR, N_FFT, HOP_LENGTH) holding the power spectrogram of
+# every clip in a single memory-mapped array. Any mel variant (N_MELS, fmin,
+# fmax, dB reference) is then one matrix multiply away, without re-decoding.
+#
+#   power.npy     float32 (n_files, 1 + n_fft // 2, max_frames), zero-padded
+#   n_frames.npy  int32 (n_files,) valid frames per clip
+#   names.txt     feature name per row
+#   keys.txt      sha256 of each row's audio file
+#   meta.json     sr, n_fft, hop_length, max_frames (written last)
+#
+# update() rewrites the arrays for a new clip list but copies the rows of
+# clips whose name and content hash are unchanged, so only new or edited
+# clips are decoded.
+
+def content_key(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class StftCache:
+    def __init__(self, n_fft=N_FFT, hop_length=HOP_LENGTH, root=STFT_CACHE_DIR):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.sr = SR
+        # same audio duration as TARGET_FRAMES at the feature hop length
+        self.max_frames = int(np.ceil(TARGET_FRAMES * HOP_LENGTH / hop_length))
+        self.dir = os.path.join(root, f"sr{SR}_nfft{n_fft}_hop{hop_length}")
+        self.power = None
+        self.n_frames = None
+        self.names = None
+        self.keys = None
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def exists(self):
+        return os.path.exists(self._path("meta.json"))
+
+    def update(self, paths, keys=None, on_power=None):
+        """
+        Makes the cache hold paths, in order. Rows whose clip name and content
+        key are already cached are copied; other clips are decoded, and
+        on_power(i, S) is called with each freshly computed power spectrogram.
+        Returns the number of clips decoded.
+        """
+        names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+        keys = list(keys) if keys is not None else [content_key(p) for p in paths]
+
+        old_rows = {}
+        if self.exists():
+            self.open()
+            if (self.n_fft, self.hop_length, self.max_frames) == self._meta_shape():
+                old_rows = {(n, k): i for i, (n, k) in enumerate(zip(self.names, self.keys))}
+            if self.names == names and self.keys == keys and old_rows:
+                return 0
+
+        os.makedirs(self.dir, exist_ok=True)
+        power = np.lib.format.open_memmap(
+            self._path("power.tmp.npy"), mode="w+", dtype=np.float32,
+            shape=(len(names), 1 + self.n_fft // 2, self.max_frames)
+        )
+        n_frames = np.zeros(len(names), dtype=np.int32)
+        decoded = 0
+        for i, (path, name, key) in enumerate(zip(paths, names, keys)):
+            j = old_rows.get((name, key))
+            if j is not None:
+                power[i] = self.power[j]
+                n_frames[i] = self.n_frames[j]
+                continue
+            S = extract_power(path, self.n_fft, self.hop_length)
+            T = min(S.shape[1], self.max_frames)
+            power[i, :, :T] = S[:, :T]
+            power[i, :, T:] = 0
+            n_frames[i] = T
+            decoded += 1
+            if on_power is not None:
+                on_power(i, S)
+        power.flush()
+        del power
+        # release the old maps before replacing the files they point at;
+        # without meta.json a crash below leaves a cache that is rebuilt
+        self.power = None
+        if os.path.exists(self._path("meta.json")):
+            os.remove(self._path("meta.json"))
+
+        os.replace(self._path("power.tmp.npy"), self._path("power.npy"))
+        np.save(self._path("n_frames.npy"), n_frames)
+        with open(self._path("names.txt"), "w") as f:
+            f.write("\n".join(names) + "\n")
+        with open(self._path("keys.txt"), "w") as f:
+            f.write("\n".join(keys) + "\n")
+        with open(self._path("meta.json"), "w") as f:
+            json.dump({"sr": self.sr, "n_fft": self.n_fft, "hop_length": self.hop_length,
+                       "max_frames": self.max_frames}, f)
+        return decoded
+
+    def _meta_shape(self):
+        with open(self._path("meta.json")) as f:
+            meta = json.load(f)
+        return meta["n_fft"], meta["hop_length"], meta["max_frames"]
+
+    def open(self):
+        if not self.exists():
+            raise FileNotFoundError(
+                f"No STFT cache in {self.dir}; run extract_mel_features.py --stft-cache first"
+            )
+        self.power = np.load(self._path("power.npy"), mmap_mode="r")
+        self.n_frames = np.load(self._path("n_frames.npy"))
+        with open(self._path("names.txt")) as f:
+            self.names = f.read().split()
+        keys = self._path("keys.txt")
+        if os.path.exists(keys):
+            with open(keys) as f:
+                self.keys = f.read().split()
+        else:
+            # cache written before content keys: no row can be reused
+            self.keys = [None] * len(self.names)
+        return self
+
+
+def derive_mels(cache, n_mels=N_MELS, fmin=0.0, fmax=None, ref="max",
+                top_db=TOP_DB, batch_size=256, out=None):
+    """
+    Mel dB features for every cached clip, shape (n_files, n_mels, max_frames).
+
+    ref="max" reproduces power_to_db(ref=np.max) per clip; a number is used as
+    a fixed reference power. Frames past a clip's end are 0, as pad_or_trim
+    leaves them. With the default parameters this equals extract_mel +
+    pad_or_trim for clips up to max_frames long.
+    """
+    basis = librosa.filters.mel(sr=cache.sr, n_fft=cache.n_fft, n_mels=n_mels,
+                                fmin=fmin, fmax=fmax).astype(np.float32)
+    n = len(cache.names)
+    if out is None:
+        out = np.empty((n, n_mels, cache.max_frames), dtype=np.float32)
+
+    valid = np.arange(cache.max_frames)[None, :] < cache.n_frames[:, None]
+    for s in range(0, n, batch_size):
+        e = min(s + batch_size, n)
+        mel = np.matmul(basis, cache.power[s:e])          # (B, n_mels, T)
+        v = valid[s:e, None, :]
+
+        if ref == "max":
+            ref_power = np.where(v, mel, 0).max(axis=(1, 2))
+        else:
+            ref_power = np.full(e - s, float(ref))
+        db = 10.0 * np.log10(np.maximum(mel, AMIN))
+        db -= 10.0 * np.log10(np.maximum(ref_power, AMIN))[:, None, None]
+
+        if top_db is not None:
+            floor = np.where(v, db, -np.inf).max(axis=(1, 2)) - top_db
+            db = np.maximum(db, floor[:, None, None])
+        out[s:e] = np.where(v, db, 0)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract mel features (and optional STFT cache)")
+    parser.add_argument("--stft-cache", action="store_true",
+                        help="also persist power spectrograms for later mel sweeps")
+    parser.add_argument("--cache-only", action="store_true",
+                        help="only build the STFT cache (allows other --n-fft/--hop-length)")
+    parser.add_argument("--n-fft", type=int, default=N_FFT)
+    parser.add_argument("--hop-length", type=int, default=HOP_LENGTH)
+    args = parser.parse_args()
+
+    if (args.n_fft, args.hop_length) != (N_FFT, HOP_LENGTH) and not args.cache_only:
+        parser.error("--n-fft/--hop-length differ from the feature parameters; use --cache-only")
+
+    with open(CSV_PATH, "r") as f:
+        audio_paths = [os.path.join(BASE_DIR, "..", row["filepath"]) for row in csv.DictReader(f)]
+
+    os.makedirs(FEATURE_DIR, exist_ok=True)
+    done = set()
 
-        name = os.path.splitext(os.path.basename(audio_path))[0]
-        out_path = os.path.join(FEATURE_DIR, name + ".npy")
+    def save_features(i, S):
+        np.save(feature_path(audio_paths[i]), pad_or_trim(mel_db_from_power(S)))
+        done.add(i)
 
-        np.save(out_path, mel)
+    if args.stft_cache or args.cache_only:
+        # clips decoded for the cache also yield their features in the same pass
+        cache = StftCache(args.n_fft, args.hop_length)
+        n = cache.update(audio_paths, on_power=None if args.cache_only else save_features)
+        print(f"✔ STFT cache in {cache.dir} ({n} clips decoded, {len(audio_paths) - n} reused)")
 
-print("✔ Mel feature extraction completed.")
+    if not args.cache_only:
+        for i, audio_path in enumerate(audio_paths):
+            if i not in done:
+                save_features(i, extract_power(audio_path))
+        print("✔ Mel feature extraction completed.")
@@ -0,0 +1,534 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import librosa
+from scipy.ndimage import maximum_filter
+from concurrent.futures import ProcessPoolExecutor
+from audio_io import load_audio, AUDIO_EXTS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
+
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+INDEX_DIR = os.path.join(DATA_DIR, "fingerprint_index")
+
+# Fingerprint parameters (spectral peak pairs)
+SR = 16000
+N_FFT = 1024
+HOP_LENGTH = 256          # 16 ms offset resolution
+PEAK_NEIGHBORHOOD = (15, 9)  # (freq bins, frames) for local-max search
+PEAK_MIN_DB = -60         # ignore peaks this far below the clip max
+MAX_PEAKS_PER_SEC = 30
+FAN_OUT = 5               # pairs per anchor peak
+MIN_DT, MAX_DT = 1, 63    # target zone (frames), must fit in 6 bits
+
+# Query parameters
+MIN_MATCHES = 5           # aligned hash hits required to report a match
+MAX_POSTINGS = 5000       # skip "stop-word" hashes that are too common
+MERGE_FACTOR = 4          # add() merges this many segments of one size tier
+
+FILES_TABLE = "files.tsv"
+
+# -------------------------------------------------
+# FINGERPRINT EXTRACTION
+# -------------------------------------------------
+def find_peaks(y):
+    """Returns (frame, bin) arrays of spectral peaks, sorted by frame"""
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    S_db = librosa.amplitude_to_db(S, ref=np.max)
+
+    local_max = maximum_filter(S_db, size=PEAK_NEIGHBORHOOD, mode="constant", cval=-np.inf)
+    mask = (S_db == local_max) & (S_db > PEAK_MIN_DB)
+    mask[N_FFT // 2:, :] = False   # keep bins in 9 bits
+    bins, frames = np.nonzero(mask)
+    strength = S_db[bins, frames]
+
+    # cap peak density so dense/noisy clips do not flood the index
+    max_peaks = max(1, int(MAX_PEAKS_PER_SEC * len(y) / SR))
+    if len(frames) > max_peaks:
+        keep = np.argpartition(-strength, max_peaks)[:max_peaks]
+        bins, frames = bins[keep], frames[keep]
+
+    order = np.lexsort((bins, frames))
+    return frames[order], bins[order]
+
+
+def fingerprint(y):
+    """Returns (hashes uint32, anchor frame offsets uint32) for a signal"""
+    frames, bins = find_peaks(y)
+    hashes, offsets = [], []
+    for k in range(1, FAN_OUT + 1):
+        if len(frames) <= k:
+            break
+        dt = frames[k:] - frames[:-k]
+        ok = (dt >= MIN_DT) & (dt <= MAX_DT)
+        f1 = bins[:-k][ok].astype(np.uint32)
+        f2 = bins[k:][ok].astype(np.uint32)
+        h = (f1 << 15) | (f2 << 6) | dt[ok].astype(np.uint32)
+        hashes.append(h)
+        offsets.append(frames[:-k][ok].astype(np.uint32))
+
+    if not hashes:
+        return np.empty(0, np.uint32), np.empty(0, np.uint32)
+    return np.concatenate(hashes), np.concatenate(offsets)
+
+
+def fingerprint_file(path):
+    y, _ = load_audio(path, sr=SR, mono=True)
+    return fingerprint(y)
+
+
+def frames_to_sec(frames):
+    return frames * HOP_LENGTH / SR
+
+# -------------------------------------------------
+# ON-DISK INVERTED INDEX
+# -------------------------------------------------
+# Layout of INDEX_DIR:
+#   files.tsv              id <TAB> size <TAB> mtime_ns <TAB> path (append-only;
+#                          the last row for a path wins)
+#   next_id                next unused file id (ids are reserved here before
+#                          any segment using them is written, never reused)
+#   seg_NNNNN.hashes.npy   uint32, sorted
+#   seg_NNNNN.postings.npy uint64, (file_id << 32) | frame offset
+#   seg_NNNNN.json         [min_id, max_id] of the files in the segment
+#
+# Every add writes new immutable segments (one per FLUSH_FILES files);
+# queries binary-search each segment through a memory map and merges combine
+# sorted segments chunk by chunk, so the index never has to fit in RAM.
+# add() merges size-tiered: segments are grouped by size in powers of
+# MERGE_FACTOR and a group is merged once it holds MERGE_FACTOR segments, so
+# each posting is rewritten O(log n) times rather than on every add. Postings
+# whose id is not live in files.tsv (superseded files, or ids reserved by an
+# add that crashed before recording its files) are ignored by queries and
+# dropped by merges.
+
+FLUSH_FILES = 10000       # files per segment written by add()
+MERGE_CHUNK = 1 << 22     # postings read per segment per merge step
+
+class FingerprintIndex:
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self._load_files()
+        self._segments = None
+        self._stamp = self._state_stamp()
+
+    def _state_stamp(self):
+        table = os.path.join(self.index_dir, FILES_TABLE)
+        mtime = os.stat(table).st_mtime_ns if os.path.exists(table) else None
+        return mtime, tuple(self._segment_names())
+
+    def refresh(self):
+        """Reloads the file table and segments if another process changed the index"""
+        stamp = self._state_stamp()
+        if stamp != self._stamp:
+            self._load_files()
+            self._segments = None
+            self._stamp = stamp
+
+    # ---------- file table ----------
+    def _load_files(self):
+        self.paths = {}     # id -> path
+        self.current = {}   # path -> (id, size, mtime_ns)
+        table = os.path.join(self.index_dir, FILES_TABLE)
+        if os.path.exists(table):
+            with open(table, "r", encoding="utf-8") as f:
+                for line in f:
+                    fid, size, mtime, path = line.rstrip("\n").split("\t", 3)
+                    fid = int(fid)
+                    self.paths[fid] = path
+                    self.current[path] = (fid, int(size), int(mtime))
+        self.live_ids = np.array(sorted(v[0] for v in self.current.values()), dtype=np.uint64)
+
+    def _append_files(self, rows):
+        with open(os.path.join(self.index_dir, FILES_TABLE), "a", encoding="utf-8") as f:
+            for fid, size, mtime, path in rows:
+                f.write(f"{fid}\t{size}\t{mtime}\t{path}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._load_files()
+
+    def _rewrite_files(self):
+        """Keeps only the current row per path in files.tsv"""
+        table = os.path.join(self.index_dir, FILES_TABLE)
+        with open(table + ".tmp", "w", encoding="utf-8") as f:
+            for path, (fid, size, mtime) in sorted(self.current.items(), key=lambda kv: kv[1][0]):
+                f.write(f"{fid}\t{size}\t{mtime}\t{path}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(table + ".tmp", table)
+        self._load_files()
+
+    def _reserve_ids(self, n):
+        """Durably reserves n new file ids and returns the first"""
+        counter = os.path.join(self.index_dir, "next_id")
+        if os.path.exists(counter):
+            with open(counter) as f:
+                first = int(f.read())
+        else:
+            # older index without a counter: start past every id ever used
+            used = list(self.paths) + [r[1] for r in self._segment_ranges().values()]
+            first = max(used) + 1 if used else 0
+        with open(counter + ".tmp", "w") as f:
+            f.write(str(first + n))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(counter + ".tmp", counter)
+        return first
+
+    def _rel(self, path):
+        return os.path.relpath(os.path.abspath(path), ROOT_DIR).replace(os.sep, "/")
+
+    def is_indexed(self, path):
+        entry = self.current.get(self._rel(path))
+        if entry is None:
+            return False
+        st = os.stat(path)
+        return entry[1] == st.st_size and entry[2] == st.st_mtime_ns
+
+    # ---------- segments ----------
+    def _segment_names(self):
+        return sorted(f[:-len(".hashes.npy")] for f in os.listdir(self.index_dir)
+                      if f.endswith(".hashes.npy"))
+
+    def _segment_ranges(self):
+        ranges = {}
+        for name in self._segment_names():
+            meta = os.path.join(self.index_dir, name + ".json")
+            if os.path.exists(meta):
+                with open(meta) as f:
+                    ranges[name] = tuple(json.load(f))
+        return ranges
+
+    def segments(self):
+        if self._segments is None:
+            self._segments = []
+            for name in self._segment_names():
+                base = os.path.join(self.index_dir, name)
+                self._segments.append((
+                    np.load(base + ".hashes.npy", mmap_mode="r"),
+                    np.load(base + ".postings.npy", mmap_mode="r"),
+                ))
+        return self._segments
+
+    def _next_segment_name(self):
+        names = self._segment_names()
+        n = int(names[-1].split("_")[1]) + 1 if names else 0
+        return f"seg_{n:05d}"
+
+    def _publish_segment(self, name, id_range):
+        # arrays are written under temp names first so readers never see half
+        # a segment; the hashes file is what makes a segment visible
+        base = os.path.join(self.index_dir, name)
+        with open(base + ".json", "w") as f:
+            json.dump(list(id_range), f)
+        os.replace(base + ".postings.tmp.npy", base + ".postings.npy")
+        os.replace(base + ".hashes.tmp.npy", base + ".hashes.npy")
+        self._segments = None
+
+    def _write_segment(self, name, hashes, postings, id_range):
+        base = os.path.join(self.index_dir, name)
+        np.save(base + ".postings.tmp.npy", postings)
+        np.save(base + ".hashes.tmp.npy", hashes)
+        self._publish_segment(name, id_range)
+
+    # ---------- add ----------
+    def add(self, paths, workers=None):
+        """Fingerprints new or changed files, writing a segment every FLUSH_FILES files"""
+        todo = [p for p in paths if not self.is_indexed(p)]
+        if not todo:
+            return 0
+
+        batch = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, (h, off) in zip(todo, pool.map(fingerprint_file, todo, chunksize=16)):
+                batch.append((path, h, off))
+                if len(batch) >= FLUSH_FILES:
+                    self._flush(batch)
+                    batch = []
+        if batch:
+            self._flush(batch)
+
+        self._merge_tiers()
+        self._stamp = self._state_stamp()
+        return len(todo)
+
+    def _flush(self, batch):
+        # ids first, then the segment, then the table: a crash at any point
+        # leaves at most postings for ids that will never be live
+        first = self._reserve_ids(len(batch))
+        rows, all_hashes, all_postings = [], [], []
+        for fid, (path, h, off) in enumerate(batch, start=first):
+            st = os.stat(path)
+            rows.append((fid, st.st_size, st.st_mtime_ns, self._rel(path)))
+            all_hashes.append(h)
+            all_postings.append((np.uint64(fid) << np.uint64(32)) | off.astype(np.uint64))
+
+        hashes = np.concatenate(all_hashes)
+        postings = np.concatenate(all_postings)
+        order = np.argsort(hashes, kind="stable")
+        self._write_segment(self._next_segment_name(), hashes[order], postings[order],
+                            (first, first + len(batch) - 1))
+        self._append_files(rows)
+
+    # ---------- compaction ----------
+    def _has_stale(self):
+        if len(self.paths) != len(self.current):
+            return True
+        # segments holding ids that never made it into files.tsv
+        return any(lo <= hi and (lo not in self.paths or hi not in self.paths)
+                   for lo, hi in self._segment_ranges().values())
+
+    def _live(self, postings):
+        return np.isin(postings >> np.uint64(32), self.live_ids)
+
+    def _segment_size(self, name):
+        return np.load(os.path.join(self.index_dir, name + ".hashes.npy"), mmap_mode="r").shape[0]
+
+    def _merge_tiers(self):
+        """Merges groups of MERGE_FACTOR similarly sized segments until none remain"""
+        while True:
+            tiers = {}
+            for name in self._segment_names():
+                size = max(self._segment_size(name), 1)
+                tiers.setdefault(int(np.log(size) / np.log(MERGE_FACTOR)), []).append(name)
+            full = [names for _, names in sorted(tiers.items()) if len(names) >= MERGE_FACTOR]
+            if not full:
+                return
+            self._merge(full[0][:MERGE_FACTOR])
+
+    def compact(self):
+        """Merges every segment into one and drops superseded rows from files.tsv"""
+        names = self._segment_names()
+        if not names or (len(names) == 1 and not self._has_stale()):
+            return
+        self._merge(names)
+        # superseded rows have no postings left; drop them so the index is
+        # not considered stale again
+        self._rewrite_files()
+        self._stamp = self._state_stamp()
+
+    def _merge(self, names):
+        """Replaces the named segments with one merged segment of their live postings"""
+        name = self._next_segment_name()
+        id_range = self._merge_into(names, os.path.join(self.index_dir, name))
+        # the memory maps of the inputs were released inside _merge_into;
+        # Windows cannot delete a file that is still mapped
+        self._segments = None
+        self._publish_segment(name, id_range)
+        for old in names:
+            for ext in (".hashes.npy", ".postings.npy", ".json"):
+                path = os.path.join(self.index_dir, old + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _merge_into(self, names, base):
+        """
+        Streams a k-way merge of the (sorted) named segments into temp arrays
+        at base, dropping postings of ids that are not live. Memory use is
+        bounded by MERGE_CHUNK postings per segment. Returns the id range of
+        the postings written.
+        """
+        segs = [(np.load(os.path.join(self.index_dir, n + ".hashes.npy"), mmap_mode="r"),
+                 np.load(os.path.join(self.index_dir, n + ".postings.npy"), mmap_mode="r"))
+                for n in names]
+
+        # pass 1: count surviving postings so the output can be preallocated
+        total = 0
+        for _, post in segs:
+            for s in range(0, len(post), MERGE_CHUNK):
+                total += int(self._live(np.asarray(post[s:s + MERGE_CHUNK])).sum())
+
+        out_h = np.lib.format.open_memmap(base + ".hashes.tmp.npy", mode="w+",
+                                          dtype=np.uint32, shape=(total,))
+        out_p = np.lib.format.open_memmap(base + ".postings.tmp.npy", mode="w+",
+                                          dtype=np.uint64, shape=(total,))
+
+        # pass 2: merge. Each step takes, from every segment, the postings with
+        # hash below the smallest "last hash of the next chunk" among segments
+        # that still have more than a chunk left; all of those are in memory.
+        cursors = [0] * len(segs)
+        written = 0
+        lo_id, hi_id = None, None
+        while any(c < len(h) for c, (h, _) in zip(cursors, segs)):
+            ends = [min(c + MERGE_CHUNK, len(h)) for c, (h, _) in zip(cursors, segs)]
+            limits = [int(h[e - 1]) for (h, _), c, e in zip(segs, cursors, ends) if e < len(h)]
+            cutoff = min(limits) if limits else None
+
+            parts_h, parts_p = [], []
+            for j, (h, p) in enumerate(segs):
+                c, e = cursors[j], ends[j]
+                if c >= len(h):
+                    continue
+                if cutoff is None:
+                    stop = e
+                else:
+                    stop = c + int(np.searchsorted(h[c:e], cutoff, side="left"))
+                parts_h.append(np.asarray(h[c:stop]))
+                parts_p.append(np.asarray(p[c:stop]))
+                cursors[j] = stop
+
+            if cutoff is not None and not any(len(x) for x in parts_h):
+                # every pending chunk starts with the cutoff hash: take that
+                # hash's whole run from each segment (bounded by its postings)
+                for j, (h, p) in enumerate(segs):
+                    c = cursors[j]
+                    if c >= len(h):
+                        continue
+                    stop = c + int(np.searchsorted(h[c:], cutoff, side="right"))
+                    parts_h.append(np.asarray(h[c:stop]))
+                    parts_p.append(np.asarray(p[c:stop]))
+                    cursors[j] = stop
+
+            hashes = np.concatenate(parts_h)
+            postings = np.concatenate(parts_p)
+            live = self._live(postings)
+            hashes, postings = hashes[live], postings[live]
+            if len(postings):
+                fids = postings >> np.uint64(32)
+                lo_id = int(fids.min()) if lo_id is None else min(lo_id, int(fids.min()))
+                hi_id = int(fids.max()) if hi_id is None else max(hi_id, int(fids.max()))
+            order = np.argsort(hashes, kind="stable")
+            out_h[written:written + len(order)] = hashes[order]
+            out_p[written:written + len(order)] = postings[order]
+            written += len(order)
+
+        out_h.flush()
+        out_p.flush()
+        return (lo_id, hi_id) if lo_id is not None else (0, -1)
+
+    # ---------- query ----------
+    def query(self, path, min_matches=MIN_MATCHES, exclude_self=True, top_k=10):
+        """
+        Returns matches for an audio file, best first. Each match is a dict with
+        the indexed file, the offset (s) in that file where the matched material
+        starts, the matched span (s) inside the query and the number of aligned
+        hashes.
+        """
+        q_hashes, q_offsets = fingerprint_file(path)
+        if len(q_hashes) == 0:
+            return []
+
+        match_ids, match_deltas, match_q = [], [], []
+        for seg_hashes, seg_postings in self.segments():
+            lo = np.searchsorted(seg_hashes, q_hashes, side="left")
+            hi = np.searchsorted(seg_hashes, q_hashes, side="right")
+            counts = hi - lo
+            ok = (counts > 0) & (counts <= MAX_POSTINGS)
+            if not ok.any():
+                continue
+            lo, counts, q_off = lo[ok], counts[ok], q_offsets[ok]
+
+            # expand every [lo, hi) range into flat posting positions
+            rep = np.repeat(np.arange(len(lo)), counts)
+            pos = lo[rep] + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+            post = np.asarray(seg_postings[pos])
+
+            fids = post >> np.uint64(32)
+            db_off = (post & np.uint64(0xFFFFFFFF)).astype(np.int64)
+            match_ids.append(fids)
+            match_deltas.append(db_off - q_off[rep].astype(np.int64))
+            match_q.append(q_off[rep])
+
+        if not match_ids:
+            return []
+
+        fids = np.concatenate(match_ids)
+        deltas = np.concatenate(match_deltas)
+        q_off = np.concatenate(match_q)
+
+        keep = np.isin(fids, self.live_ids)
+        if exclude_self:
+            own = self.current.get(self._rel(path))
+            if own is not None:
+                keep &= fids != own[0]
+        fids, deltas, q_off = fids[keep], deltas[keep], q_off[keep]
+        if len(fids) == 0:
+            return []
+
+        # histogram of (file, time delta): true matches pile up on one delta
+        pairs = np.stack([fids.astype(np.int64), deltas], axis=1)
+        uniq, inverse, counts = np.unique(pairs, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+
+        best = {}
+        for j in np.argsort(-counts):
+            if counts[j] < min_matches:
+                break
+            fid, delta = int(uniq[j, 0]), int(uniq[j, 1])
+            if fid in best:
+                continue
+            span = q_off[inverse == j].astype(np.int64)
+            best[fid] = {
+                "file": self.paths[fid],
+                "offset": float(frames_to_sec(span.min() + delta)),
+                "query_start": float(frames_to_sec(span.min())),
+                "query_end": float(frames_to_sec(span.max())),
+                "hits": int(counts[j]),
+            }
+            if len(best) >= top_k:
+                break
+        return list(best.values())
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+def collect_audio(roots):
+    paths = []
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames
+                                 if os.path.join(dirpath, d) != INDEX_DIR)
+            for fname in sorted(filenames):
+                if fname.lower().endswith(AUDIO_EXTS):
+                    paths.append(os.path.join(dirpath, fname))
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Corpus-wide acoustic fingerprint index")
+    parser.add_argument("--index", default=INDEX_DIR, help="index directory")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_add = sub.add_parser("add", help="index new/changed audio files")
+    p_add.add_argument("roots", nargs="*", default=[DATA_DIR])
+    p_add.add_argument("--workers", type=int, default=None)
+
+    p_query = sub.add_parser("query", help="find indexed clips that share material with a file")
+    p_query.add_argument("path")
+    p_query.add_argument("--min-matches", type=int, default=MIN_MATCHES)
+
+    sub.add_parser("compact", help="merge segments into one")
+
+    args = parser.parse_args(argv)
+    index = FingerprintIndex(args.index)
+
+    if args.cmd == "add":
+        paths = collect_audio(args.roots)
+        t0 = time.perf_counter()
+        n = index.add(paths, workers=args.workers)
+        print(f"✔ indexed {n} new files ({len(paths) - n} unchanged) "
+              f"in {time.perf_counter() - t0:.1f}s")
+
+    elif args.cmd == "query":
+        t0 = time.perf_counter()
+        matches = index.query(args.path, min_matches=args.min_matches)
+        elapsed = (time.perf_counter() - t0) * 1000
+        if not matches:
+            print(f"No matches ({elapsed:.0f} ms)")
+        for m in matches:
+            print(f"{m['file']}  offset={m['offset']:.2f}s  "
+                  f"query=[{m['query_start']:.2f}s, {m['query_end']:.2f}s]  hits={m['hits']}")
+        print(f"Query time: {elapsed:.0f} ms")
+
+    elif args.cmd == "compact":
+        index.compact()
+        print("✔ index compacted")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
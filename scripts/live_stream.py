@@ -0,0 +1,460 @@
+import os
+import abc
+import sys
+import time
+import errno
+import socket
+import struct
+import argparse
+import threading
+import numpy as np
+import librosa
+from scipy.signal import get_window
+from audio_io import load_audio
+from model_tiers import load_tiers, select_tier, resolve
+
+# Must match app.py / extract_mel_features.py
+SR = 16000
+N_MELS = 128
+N_FFT = 2048
+HOP_LENGTH = 512
+WINDOW = 40
+HOP = 20
+WIN_THRESH = 0.695
+TOP_DB = 80.0
+AMIN = 1e-10
+
+WINDOW_SEC = WINDOW * HOP_LENGTH / SR   # 1.28 s of audio per window
+LATENCY_BUDGET = WINDOW_SEC             # detection must keep up with one window
+POLL_INTERVAL = 0.05
+IDLE_TIMEOUT = 3.0        # a source silent this long is treated as finished
+DISPLAY_SECONDS = 30
+
+# -------------------------------------------------
+# PCM SOURCES
+# -------------------------------------------------
+# Every source returns whatever mono float32 samples are available right now
+# (possibly none) from read(), and sets .closed once the producer is gone.
+
+class _RawPcmSource(abc.ABC):
+    def __init__(self, sr=SR, channels=1):
+        self.sr = sr
+        self.channels = channels
+        self.closed = False
+        self._rest = b""
+
+    @abc.abstractmethod
+    def _read_bytes(self):
+        """Returns the bytes available right now (possibly none)"""
+
+    def read(self):
+        data = self._rest + self._read_bytes()
+        frame_bytes = 2 * self.channels
+        usable = len(data) - len(data) % frame_bytes
+        self._rest = data[usable:]
+        pcm = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        if self.channels > 1:
+            pcm = pcm.reshape(-1, self.channels).mean(axis=1)
+        return pcm
+
+
+# data-chunk sizes recorders write while they do not know the final length
+STREAMING_DATA_SIZES = (0, 0xFFFFFFFF, 0xFFFFFFFF - 36)
+
+
+class GrowingWavSource(_RawPcmSource):
+    """
+    Tails a 16-bit PCM WAV file that another process is still writing. If
+    the header carries a real data size, reading stops (and the source
+    closes) at the end of the data chunk.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._f = None
+        self._data_offset = None
+        self._remaining = None   # bytes left in the data chunk, None = unbounded
+
+    def _parse_header(self):
+        self._f.seek(0)
+        head = self._f.read(12)
+        if len(head) < 12:
+            return False
+        if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            raise ValueError(f"{self.path} is not a WAV file")
+        pos = 12
+        while True:
+            self._f.seek(pos)
+            chunk = self._f.read(8)
+            if len(chunk) < 8:
+                return False
+            cid, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if cid == b"fmt ":
+                fmt = self._f.read(16)
+                if len(fmt) < 16:
+                    return False
+                tag, self.channels, self.sr, _, _, bits = struct.unpack("<HHIIHH", fmt)
+                if tag != 1 or bits != 16:
+                    raise ValueError("live WAV input must be 16-bit PCM")
+                if self.sr != SR:
+                    raise ValueError(f"live source must be {SR} Hz, {self.path} is {self.sr} Hz")
+            elif cid == b"data":
+                self._data_offset = pos + 8
+                if size not in STREAMING_DATA_SIZES:
+                    self._remaining = size
+                self._f.seek(self._data_offset)
+                return True
+            pos += 8 + size + (size & 1)
+
+    def _read_bytes(self):
+        if self._f is None:
+            if not os.path.exists(self.path):
+                return b""
+            self._f = open(self.path, "rb")
+        if self._data_offset is None and not self._parse_header():
+            return b""
+        if self._remaining is None:
+            return self._f.read()
+        data = self._f.read(self._remaining)
+        self._remaining -= len(data)
+        if self._remaining == 0:
+            self.closed = True
+        return data
+
+
+class FifoSource(_RawPcmSource):
+    """Reads raw 16-bit little-endian mono PCM from a named pipe"""
+
+    def __init__(self, path, sr=SR):
+        super().__init__(sr)
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        self._fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self._seen_writer = False
+
+    def _read_bytes(self):
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                break
+            if not chunk:
+                # EOF only counts once a writer has connected
+                if self._seen_writer:
+                    self.closed = True
+                break
+            self._seen_writer = True
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+class SocketSource(_RawPcmSource):
+    """Reads raw 16-bit little-endian mono PCM from a TCP connection"""
+
+    def __init__(self, host, port, sr=SR):
+        super().__init__(sr)
+        self._sock = socket.create_connection((host, port))
+        self._sock.setblocking(False)
+
+    def _read_bytes(self):
+        chunks = []
+        while True:
+            try:
+                chunk = self._sock.recv(1 << 16)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not chunk:
+                self.closed = True
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+def simulate_wav_stream(src_path, out_path, chunk_ms=100, speed=1.0):
+    """
+    Local stand-in for a recorder: writes src_path into out_path as a growing
+    16-bit WAV in real time. Returns the writer thread (already started).
+    """
+    y, _ = load_audio(src_path, sr=SR, mono=True)
+    pcm = (np.clip(y, -1, 1) * 32767).astype("<i2")
+    chunk = int(SR * chunk_ms / 1000)
+
+    def writer():
+        with open(out_path, "wb") as f:
+            # streaming recorders do not know the final size; use the maximum
+            f.write(b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE")
+            f.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, SR, SR * 2, 2, 16))
+            f.write(b"data" + struct.pack("<I", 0xFFFFFFFF - 36))
+            f.flush()
+            for i in range(0, len(pcm), chunk):
+                f.write(pcm[i:i + chunk].tobytes())
+                f.flush()
+                time.sleep(chunk_ms / 1000 / speed)
+
+    t = threading.Thread(target=writer, daemon=True)
+    t.start()
+    return t
+
+# -------------------------------------------------
+# RING BUFFER
+# -------------------------------------------------
+class RingBuffer:
+    """Fixed-capacity buffer of rows (samples or frames) along axis 0"""
+
+    def __init__(self, capacity, row_shape=(), dtype=np.float32):
+        self.capacity = capacity
+        self.data = np.zeros((capacity,) + tuple(row_shape), dtype=dtype)
+        self.written = 0   # total rows ever written
+
+    def write(self, rows):
+        n = len(rows)
+        if n >= self.capacity:
+            rows = rows[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = rows[:first]
+        self.data[:n - first] = rows[first:]
+        self.written += n
+
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def get(self, start, stop):
+        """Rows [start, stop) in absolute row numbers; they must still be buffered"""
+        if start < self.oldest() or stop > self.written:
+            raise IndexError("rows no longer (or not yet) in the ring buffer")
+        idx = np.arange(start, stop) % self.capacity
+        return self.data[idx]
+
+# -------------------------------------------------
+# INCREMENTAL MEL
+# -------------------------------------------------
+class IncrementalMel:
+    """
+    Turns a sample stream into log-mel frames as soon as each STFT frame is
+    complete. The stream is prefixed with N_FFT/2 zeros so frame t lines up
+    with librosa's centered frame t (pad_mode="constant").
+    """
+
+    def __init__(self):
+        self.window = get_window("hann", N_FFT, fftbins=True).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(sr=SR, n_fft=N_FFT, n_mels=N_MELS)
+        self.pending = np.zeros(N_FFT // 2, dtype=np.float32)
+
+    def push(self, samples):
+        """Returns new frames as (n, N_MELS) log-power (10*log10, unreferenced)"""
+        buf = np.concatenate([self.pending, samples])
+        if len(buf) < N_FFT:
+            self.pending = buf
+            return np.empty((0, N_MELS), dtype=np.float32)
+
+        n = 1 + (len(buf) - N_FFT) // HOP_LENGTH
+        frames = np.lib.stride_tricks.sliding_window_view(buf, N_FFT)[::HOP_LENGTH][:n]
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        mel = power @ self.mel_basis.T
+        self.pending = buf[n * HOP_LENGTH:]
+        return (10.0 * np.log10(np.maximum(mel, AMIN))).astype(np.float32)
+
+# -------------------------------------------------
+# LIVE DETECTOR
+# -------------------------------------------------
+class LiveDetector:
+    """
+    Scores windows of a live stream on the same WINDOW/HOP grid as the
+    offline predict_file. dB values are referenced to the running maximum
+    (the offline path uses the whole-file maximum, which a stream cannot know).
+
+    Latency of a window is measured from the previous poll (the earliest the
+    window's last samples could have arrived unseen) to the moment its score
+    is available, and compared against LATENCY_BUDGET.
+    """
+
+    def __init__(self, model, source, win_thresh=WIN_THRESH,
+                 display_seconds=DISPLAY_SECONDS, budget=LATENCY_BUDGET):
+        self.model = model
+        self.source = source
+        if source.sr != SR:
+            raise ValueError(f"live source must be {SR} Hz, got {source.sr} Hz")
+        self.win_thresh = win_thresh
+        self.budget = budget
+
+        n_frames = max(int(display_seconds * SR / HOP_LENGTH), 2 * WINDOW)
+        self.frames = RingBuffer(n_frames, (N_MELS,))
+        self.mel = IncrementalMel()
+
+        self.ref_db = -np.inf
+        self.next_window = 0
+        self.dropped = 0
+        self.results = []   # dicts: time, score, latency, compute
+        self._last_poll = time.perf_counter()
+        self._last_audio = self._last_poll
+
+    def warm_up(self):
+        """Runs the model once so graph tracing does not count against the first window"""
+        self.model(np.zeros((1, N_MELS, WINDOW, 1), np.float32), training=False)
+        self._last_poll = self._last_audio = time.perf_counter()
+
+    def idle_seconds(self):
+        return time.perf_counter() - self._last_audio
+
+    def window_db(self, start):
+        win = self.frames.get(start, start + WINDOW).T - self.ref_db
+        return np.maximum(win, -TOP_DB)
+
+    def poll(self):
+        """Consumes available audio and returns the windows scored by this call"""
+        prev_poll, self._last_poll = self._last_poll, time.perf_counter()
+        samples = self.source.read()
+        if len(samples) == 0:
+            return []
+        self._last_audio = self._last_poll
+
+        frames = self.mel.push(samples)
+        if len(frames):
+            self.ref_db = max(self.ref_db, float(frames.max()))
+            self.frames.write(frames)
+
+        starts = []
+        while self.next_window + WINDOW <= self.frames.written:
+            if self.next_window >= self.frames.oldest():
+                starts.append(self.next_window)
+            else:
+                self.dropped += 1
+            self.next_window += HOP
+        if not starts:
+            return []
+
+        batch = np.stack([self.window_db(s) for s in starts])[..., None]
+        t0 = time.perf_counter()
+        scores = np.asarray(self.model(batch, training=False))[:, 0]
+        done = time.perf_counter()
+
+        new = []
+        for s, p in zip(starts, scores):
+            new.append({
+                "time": (s + WINDOW / 2) * HOP_LENGTH / SR,
+                "score": float(p),
+                "latency": done - prev_poll,
+                "compute": (done - t0) / len(starts),
+            })
+        self.results.extend(new)
+        return new
+
+    def finish(self):
+        """Scores a zero-padded window for streams shorter than one window"""
+        if self.results or self.frames.written == 0:
+            return []
+        T = self.frames.written
+        win = np.maximum(self.frames.get(0, T).T - self.ref_db, -TOP_DB)
+        win = np.pad(win, ((0, 0), (0, WINDOW - T)))
+        p = float(np.asarray(self.model(win[None, ..., None], training=False))[0, 0])
+        self.results.append({"time": 0.0, "score": p, "latency": 0.0, "compute": 0.0})
+        return self.results[-1:]
+
+    def rolling_mel(self):
+        """Returns (mel_db, t0): buffered frames in dB and the time of the first one"""
+        start = self.frames.oldest()
+        mel = self.frames.get(start, self.frames.written).T - self.ref_db
+        return np.maximum(mel, -TOP_DB), start * HOP_LENGTH / SR
+
+    def ratio(self):
+        if not self.results:
+            return 0.0
+        return sum(r["score"] > self.win_thresh for r in self.results) / len(self.results)
+
+    def latency_report(self):
+        lat = np.array([r["latency"] for r in self.results])
+        if len(lat) == 0:
+            return {"windows": 0, "budget": self.budget}
+        return {
+            "windows": len(lat),
+            "dropped": self.dropped,
+            "budget": self.budget,
+            "p50": float(np.percentile(lat, 50)),
+            "p95": float(np.percentile(lat, 95)),
+            "max": float(lat.max()),
+            "over_budget": int((lat > self.budget).sum()),
+            "compute_mean": float(np.mean([r["compute"] for r in self.results])),
+        }
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+def open_source(args):
+    if args.fifo:
+        return FifoSource(args.fifo)
+    if args.socket:
+        host, port = args.socket.rsplit(":", 1)
+        return SocketSource(host, int(port))
+    return GrowingWavSource(args.wav)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live tampering monitor over a PCM stream")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--wav", help="growing 16-bit WAV file to tail")
+    src.add_argument("--fifo", help="named pipe with raw 16-bit mono PCM")
+    src.add_argument("--socket", help="host:port serving raw 16-bit mono PCM")
+    parser.add_argument("--simulate", help="stream this audio file into --wav in real time")
+    parser.add_argument("--latency-budget", type=float, metavar="MS",
+                        help="pick the most accurate model tier within this per-window latency (batch 1)")
+    parser.add_argument("--model", help="model file to use instead of a tier (a known tier's threshold is reused)")
+    parser.add_argument("--win-thresh", type=float, help="window threshold, overriding the tier's")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT, help="stop after this long without audio")
+    parser.add_argument("--single-core", action="store_true", help="restrict TensorFlow to one thread")
+    args = parser.parse_args(argv)
+
+    if args.simulate and not args.wav:
+        parser.error("--simulate requires --wav")
+
+    if args.model:
+        model_path = os.path.abspath(args.model)
+        tier = next((t for t in load_tiers() if os.path.abspath(resolve(t)) == model_path), None)
+        if tier is None and args.win_thresh is None:
+            parser.error(f"{args.model} is not a known model tier; pass --win-thresh")
+    else:
+        tier = select_tier(args.latency_budget, batch_size=1)
+        model_path = resolve(tier)
+    win_thresh = args.win_thresh if args.win_thresh is not None else tier["win_thresh"]
+    print(f"Model: {model_path} (WIN_THRESH={win_thresh:.3f})")
+
+    import tensorflow as tf
+    if args.single_core:
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    model = tf.keras.models.load_model(model_path)
+
+    if args.simulate:
+        if os.path.exists(args.wav):
+            os.remove(args.wav)
+        simulate_wav_stream(args.simulate, args.wav)
+
+    detector = LiveDetector(model, open_source(args), win_thresh=win_thresh)
+    detector.warm_up()
+
+    while not detector.source.closed:
+        new = detector.poll()
+        if not new and detector.idle_seconds() > args.idle_timeout:
+            break
+        for r in new:
+            flag = "⚠️" if r["score"] > detector.win_thresh else "  "
+            print(f"{flag} t={r['time']:6.2f}s  score={r['score']:.3f}  latency={r['latency'] * 1000:6.1f} ms")
+        time.sleep(POLL_INTERVAL)
+    detector.finish()
+
+    rep = detector.latency_report()
+    print(f"\nWindows: {rep['windows']}  tampered ratio: {detector.ratio():.1%}")
+    if rep["windows"]:
+        print(f"Latency p50={rep['p50'] * 1000:.1f} ms  p95={rep['p95'] * 1000:.1f} ms  "
+              f"max={rep['max'] * 1000:.1f} ms  budget={rep['budget'] * 1000:.0f} ms  "
+              f"over budget: {rep['over_budget']}  dropped: {rep['dropped']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 import os
-import librosa
+from audio_io import load_audio
 
 # get path of THIS script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -8,7 +8,7 @@ audio_path = os.path.join(
     BASE_DIR, "..", "data", "authentic_wav", "auth_01.wav"
 )
 
-audio, sr = librosa.load(audio_path, sr=None)
+audio, sr = load_audio(audio_path, sr=None)
 
 print("Sample rate:", sr)
 print("Audio shape:", audio.shape)
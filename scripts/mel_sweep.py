@@ -0,0 +1,65 @@
+import os
+import time
+import json
+import argparse
+import itertools
+import numpy as np
+
+from extract_mel_features import StftCache, derive_mels, N_FFT, HOP_LENGTH, N_MELS, TOP_DB
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SWEEP_DIR = os.path.join(BASE_DIR, "..", "data", "feature_sweep")
+
+# Derives every mel configuration in a grid from the cached STFT powers
+# (build or refresh them with: extract_mel_features.py --stft-cache, or
+# pipeline.py --stft-cache). Each config is written as one stacked array,
+# rows in the order of the cache's names.txt.
+
+def config_tag(n_fft, hop_length, n_mels, fmin, fmax, ref, top_db):
+    return f"nfft{n_fft}_hop{hop_length}_mels{n_mels}_f{fmin:g}-{fmax or 'nyq'}_ref{ref}_top{top_db:g}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mel feature-parameter sweep over the STFT cache")
+    parser.add_argument("--n-fft", type=int, nargs="+", default=[N_FFT])
+    parser.add_argument("--hop-length", type=int, nargs="+", default=[HOP_LENGTH])
+    parser.add_argument("--n-mels", type=int, nargs="+", default=[N_MELS])
+    parser.add_argument("--fmin", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--fmax", type=float, nargs="+", default=[None])
+    parser.add_argument("--ref", nargs="+", default=["max"], help='"max" or a fixed reference power')
+    parser.add_argument("--top-db", type=float, nargs="+", default=[TOP_DB])
+    parser.add_argument("--out", default=SWEEP_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    t_start = time.perf_counter()
+    n_configs = 0
+
+    for n_fft, hop_length in itertools.product(args.n_fft, args.hop_length):
+        cache = StftCache(n_fft, hop_length).open()
+        grid = itertools.product(args.n_mels, args.fmin, args.fmax, args.ref, args.top_db)
+        for n_mels, fmin, fmax, ref, top_db in grid:
+            ref = ref if ref == "max" else float(ref)
+            tag = config_tag(n_fft, hop_length, n_mels, fmin, fmax, ref, top_db)
+            t0 = time.perf_counter()
+
+            out = np.lib.format.open_memmap(
+                os.path.join(args.out, tag + ".npy"), mode="w+", dtype=np.float32,
+                shape=(len(cache.names), n_mels, cache.max_frames)
+            )
+            derive_mels(cache, n_mels=n_mels, fmin=fmin, fmax=fmax, ref=ref, top_db=top_db, out=out)
+            out.flush()
+            del out
+
+            with open(os.path.join(args.out, tag + ".json"), "w") as f:
+                json.dump({"n_fft": n_fft, "hop_length": hop_length, "n_mels": n_mels,
+                           "fmin": fmin, "fmax": fmax, "ref": ref, "top_db": top_db,
+                           "names": cache.names}, f)
+            n_configs += 1
+            print(f"✔ {tag}  ({time.perf_counter() - t0:.2f}s)")
+
+    print(f"✔ {n_configs} configurations in {time.perf_counter() - t_start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
+TIERS_PATH = os.path.join(ROOT_DIR, "models", "tiers.json")
+
+# Today's CNN, used when no tiers have been distilled yet
+DEFAULT_TIER = {
+    "name": "full",
+    "path": "model.h5",
+    "win_thresh": 0.695,
+    "file_acc": None,
+    "latency_b1_ms": None,
+    "per_window_b8_ms": None,
+    "per_window_b256_ms": None,
+}
+
+# tiers.json is written by distill_student.py: a list of tiers with the
+# fields of DEFAULT_TIER (paths relative to the repo root) plus the batch-256
+# latency and a "triage" flag for tiers that meet the triage speed target.
+# Latencies are measured with eager model(x, training=False) calls, the way
+# the app, live detector and triage scanner score windows.
+
+
+def load_tiers(path=TIERS_PATH):
+    if not os.path.exists(path):
+        return [DEFAULT_TIER]
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def resolve(tier):
+    return os.path.join(ROOT_DIR, tier["path"])
+
+
+def latency_of(tier, batch_size):
+    if batch_size == 1:
+        return tier.get("latency_b1_ms")
+    return tier.get(f"per_window_b{batch_size}_ms")
+
+
+def select_tier(budget_ms=None, batch_size=1, tiers=None):
+    """
+    Most accurate tier whose per-window latency at batch_size (1, 8 or 256)
+    fits budget_ms. No budget selects the full model; if nothing fits, the
+    fastest tier is returned.
+    """
+    tiers = tiers or load_tiers()
+    if budget_ms is None:
+        return next((t for t in tiers if t["name"] == "full"), tiers[0])
+
+    measured = [t for t in tiers if latency_of(t, batch_size) is not None]
+    if not measured:
+        return tiers[0]
+    fits = [t for t in measured if latency_of(t, batch_size) <= budget_ms]
+    if not fits:
+        return min(measured, key=lambda t: latency_of(t, batch_size))
+    return max(fits, key=lambda t: (t["file_acc"], -latency_of(t, batch_size)))
+
+
+def triage_tier(tiers=None, batch_size=8):
+    """Fastest tier flagged for high-volume triage, else the full model"""
+    tiers = tiers or load_tiers()
+    flagged = [t for t in tiers if t.get("triage")]
+    if not flagged:
+        return select_tier(None, tiers=tiers)
+    return min(flagged, key=lambda t: latency_of(t, batch_size))
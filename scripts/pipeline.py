@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import audio_io
+import convert_flac_to_wav
+import auth_fixed_s
+import generate_tampered_dataset
+import create_dataset_csv
+import extract_mel_features
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
+
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+FLAC_DIR = os.path.join(DATA_DIR, "authentic")
+WAV_DIR = os.path.join(DATA_DIR, "authentic_wav")
+FIXED_DIR = os.path.join(DATA_DIR, "authentic_fixed")
+TAMPER_DIR = os.path.join(DATA_DIR, "manipulated", "tampered")
+FEATURE_DIR = os.path.join(DATA_DIR, "features")
+CSV_PATH = os.path.join(DATA_DIR, "dataset.csv")
+MODEL_PATH = os.path.join(ROOT_DIR, "model.h5")
+
+STATE_PATH = os.path.join(DATA_DIR, ".pipeline_state.json")
+
+STAGES = ["convert", "fix", "tamper", "csv", "features", "train"]
+
+# -------------------------------------------------
+# CONTENT HASHING
+# -------------------------------------------------
+class Hasher:
+    """sha256 of file contents, memoized on (size, mtime) across runs"""
+
+    def __init__(self, memo):
+        self.memo = memo
+
+    def file(self, path):
+        st = os.stat(path)
+        rel = rel_path(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.memo.get(rel)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.memo[rel] = [stamp, digest]
+        return digest
+
+
+def rel_path(path):
+    return os.path.relpath(os.path.abspath(path), ROOT_DIR).replace(os.sep, "/")
+
+
+def digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def code_hash(*modules):
+    # stages also depend on the shared decoder
+    h = hashlib.sha256()
+    for module in modules + (audio_io,):
+        with open(module.__file__, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+# -------------------------------------------------
+# STAGE TASKS (run in worker processes)
+# -------------------------------------------------
+def run_convert(src, dst):
+    convert_flac_to_wav.convert_file(src, dst)
+
+
+def run_fix(src, dst):
+    auth_fixed_s.fix_length(src, dst)
+
+
+def run_tamper(src, seed):
+    # seeded per input so reruns reproduce the same edits
+    generate_tampered_dataset.tamper_file(src, TAMPER_DIR, random.Random(seed))
+
+
+def run_features(src, dst):
+    extract_mel_features.extract_file(src, dst)
+
+# -------------------------------------------------
+# PIPELINE
+# -------------------------------------------------
+class Pipeline:
+    """
+    Runs the data path as a chain of stages. Each stage is split into tasks
+    (one per file for map stages); a task's key hashes its input contents,
+    the stage parameters and the stage code, and the task is skipped when
+    the key matches the last successful run and its outputs still exist.
+    """
+
+    def __init__(self, workers=None, force=(), dry_run=False, stft_cache=False):
+        self.workers = workers
+        self.force = set(force)
+        self.dry_run = dry_run
+        self.stft_cache = stft_cache
+        self.state = {"hashes": {}, "names": {}, "tasks": {}, "outputs": {}}
+        if os.path.exists(STATE_PATH):
+            with open(STATE_PATH, "r") as f:
+                self.state.update(json.load(f))
+        self.hasher = Hasher(self.state["hashes"])
+
+    def save(self):
+        if self.dry_run:
+            return
+        tmp = STATE_PATH + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, STATE_PATH)
+
+    # ---------- task bookkeeping ----------
+    def _pending(self, stage, tasks):
+        """Filters (task_id, key, outputs, fn, args) down to the tasks that must run"""
+        done = self.state["tasks"].setdefault(stage, {})
+        pending = []
+        for task_id, key, outputs, fn, args in tasks:
+            fresh = done.get(task_id) == key and all(os.path.exists(p) for p in outputs)
+            if stage in self.force or not fresh:
+                pending.append((task_id, key, outputs, fn, args))
+        return pending
+
+    def _record(self, stage, task_id, key, outputs):
+        self.state["tasks"][stage][task_id] = key
+        self.state["outputs"].setdefault(stage, {})[task_id] = [rel_path(p) for p in outputs]
+
+    def _prune(self, stage, tasks):
+        """Deletes outputs of tasks whose input no longer exists"""
+        live = {t[0] for t in tasks}
+        done = self.state["tasks"].setdefault(stage, {})
+        outputs = self.state["outputs"].setdefault(stage, {})
+        orphans = [task_id for task_id in done if task_id not in live]
+        if orphans:
+            print(f"[{stage}] removing outputs of {len(orphans)} deleted inputs")
+        if self.dry_run:
+            return
+        for task_id in orphans:
+            for rel in outputs.pop(task_id, []):
+                path = os.path.join(ROOT_DIR, rel)
+                if os.path.exists(path):
+                    os.remove(path)
+            del done[task_id]
+
+    def _run_map(self, stage, tasks):
+        self._prune(stage, tasks)
+        pending = self._pending(stage, tasks)
+        print(f"[{stage}] {len(pending)} to run, {len(tasks) - len(pending)} up to date")
+        if self.dry_run or not pending:
+            return len(pending)
+
+        failed = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(fn, *args): (task_id, key, outputs)
+                           for task_id, key, outputs, fn, args in pending}
+                for fut in as_completed(futures):
+                    task_id, key, outputs = futures[fut]
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        failed.append(task_id)
+                        print(f"[{stage}] ✘ {task_id}: {type(e).__name__}: {e}")
+                    else:
+                        self._record(stage, task_id, key, outputs)
+        finally:
+            # keep every task that did finish, even if the run is aborted
+            self.save()
+
+        if failed:
+            raise RuntimeError(f"stage '{stage}' failed for {len(failed)} task(s): {', '.join(sorted(failed))}")
+        return len(pending)
+
+    def _run_single(self, stage, task_id, key, outputs, fn):
+        pending = self._pending(stage, [(task_id, key, outputs, fn, ())])
+        print(f"[{stage}] {'rerun' if pending else 'up to date'}")
+        if self.dry_run or not pending:
+            return len(pending)
+        fn()
+        self._record(stage, task_id, key, outputs)
+        self.save()
+        return 1
+
+    # ---------- stages ----------
+    def stage_convert(self):
+        os.makedirs(WAV_DIR, exist_ok=True)
+        names = self.state["names"]
+
+        # keep the auth_NN numbering stable: new sources get the next free
+        # number in name order, and numbers of deleted sources are not reused
+        sources = sorted(f for f in os.listdir(FLAC_DIR) if f.lower().endswith(".flac"))
+        for file in sources:
+            if file not in names:
+                names[file] = f"auth_{len(names) + 1:02d}"
+
+        code = code_hash(convert_flac_to_wav)
+        tasks = []
+        for file in sources:
+            src = os.path.join(FLAC_DIR, file)
+            dst = os.path.join(WAV_DIR, names[file] + ".wav")
+            key = digest(code, self.hasher.file(src))
+            tasks.append((names[file], key, [dst], run_convert, (src, dst)))
+        return self._run_map("convert", tasks)
+
+    def stage_fix(self):
+        os.makedirs(FIXED_DIR, exist_ok=True)
+        code = code_hash(auth_fixed_s)
+        params = {"SR": auth_fixed_s.SR, "DURATION": auth_fixed_s.DURATION,
+                  "RESAMPLE": audio_io.DEFAULT_QUALITY}
+        tasks = []
+        for file in sorted(os.listdir(WAV_DIR)):
+            if not file.endswith(".wav"):
+                continue
+            src = os.path.join(WAV_DIR, file)
+            dst = os.path.join(FIXED_DIR, file)
+            key = digest(code, params, self.hasher.file(src))
+            tasks.append((file, key, [dst], run_fix, (src, dst)))
+        return self._run_map("fix", tasks)
+
+    def stage_tamper(self):
+        os.makedirs(TAMPER_DIR, exist_ok=True)
+        code = code_hash(generate_tampered_dataset)
+        tasks = []
+        for file in sorted(os.listdir(FIXED_DIR)):
+            if not file.endswith(".wav"):
+                continue
+            src = os.path.join(FIXED_DIR, file)
+            src_hash = self.hasher.file(src)
+            outputs = [os.path.join(TAMPER_DIR, f"{kind}_{file}") for kind in ("del", "splice", "speed")]
+            key = digest(code, src_hash)
+            tasks.append((file, key, outputs, run_tamper, (src, int(src_hash[:16], 16))))
+        return self._run_map("tamper", tasks)
+
+    def stage_csv(self):
+        rows = create_dataset_csv.build_rows(FIXED_DIR, TAMPER_DIR)
+        key = digest(code_hash(create_dataset_csv), rows)
+        return self._run_single("csv", "dataset.csv", key, [CSV_PATH],
+                                lambda: create_dataset_csv.write_csv(rows, CSV_PATH))
+
+    def stage_features(self):
+        os.makedirs(FEATURE_DIR, exist_ok=True)
+        m = extract_mel_features
+        code = code_hash(m)
+        params = {"SR": m.SR, "N_MELS": m.N_MELS, "N_FFT": m.N_FFT,
+                  "HOP_LENGTH": m.HOP_LENGTH, "TARGET_FRAMES": m.TARGET_FRAMES,
+                  "RESAMPLE": audio_io.DEFAULT_QUALITY}
+        tasks = []
+        for filepath, _ in create_dataset_csv.build_rows(FIXED_DIR, TAMPER_DIR):
+            src = os.path.join(ROOT_DIR, filepath)
+            dst = m.feature_path(src, FEATURE_DIR)
+            key = digest(code, params, self.hasher.file(src))
+            tasks.append((filepath, key, [dst], run_features, (src, dst)))
+        return self._run_map("features", tasks)
+
+    def stage_stft_cache(self):
+        # runs after "features" when enabled; the cache itself only decodes
+        # clips whose content hash it has not stored yet
+        m = extract_mel_features
+        cache = m.StftCache()
+        paths = [os.path.join(ROOT_DIR, filepath)
+                 for filepath, _ in create_dataset_csv.build_rows(FIXED_DIR, TAMPER_DIR)]
+        hashes = [self.hasher.file(p) for p in paths]
+        key = digest(code_hash(m), os.path.basename(cache.dir), [rel_path(p) for p in paths], hashes)
+        return self._run_single("stft_cache", os.path.basename(cache.dir), key,
+                                [os.path.join(cache.dir, "meta.json")], lambda: cache.update(paths, hashes))
+
+    def stage_train(self):
+        train_script = os.path.join(BASE_DIR, "train_cnn.py")
+        inputs = [CSV_PATH, train_script]
+        inputs += [os.path.join(FEATURE_DIR, f) for f in sorted(os.listdir(FEATURE_DIR)) if f.endswith(".npy")]
+        key = digest([self.hasher.file(p) for p in inputs])
+
+        def train():
+            subprocess.run([sys.executable, train_script], cwd=ROOT_DIR, check=True)
+
+        return self._run_single("train", "model.h5", key, [MODEL_PATH], train)
+
+    def run(self, until="train"):
+        for stage in STAGES[:STAGES.index(until) + 1]:
+            getattr(self, "stage_" + stage)()
+            if stage == "features" and self.stft_cache:
+                self.stage_stft_cache()
+        self.save()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental data pipeline: " + " → ".join(STAGES))
+    parser.add_argument("--until", choices=STAGES, default="train", help="last stage to run")
+    parser.add_argument("--force", choices=STAGES, nargs="*", default=[], help="rerun these stages fully")
+    parser.add_argument("--workers", type=int, default=None, help="parallel processes per stage")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("--stft-cache", action="store_true",
+                        help="keep the STFT power cache for mel sweeps up to date after 'features'")
+    args = parser.parse_args(argv)
+
+    Pipeline(args.workers, args.force, args.dry_run, args.stft_cache).run(args.until)
+    print("✔ Pipeline up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import os
 import random
-import librosa
 import soundfile as sf
+from audio_io import load_audio
 
 # get base directory of this script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -18,7 +18,7 @@ output_dir = os.path.join(
 os.makedirs(output_dir, exist_ok=True)
 
 # load audio
-audio, sr = librosa.load(input_path, sr=None)
+audio, sr = load_audio(input_path, sr=None)
 
 # choose random deletion length (5%–15% of audio)
 total_len = len(audio)
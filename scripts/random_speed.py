@@ -2,6 +2,7 @@ import os
 import random
 import librosa
 import soundfile as sf
+from audio_io import load_audio
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -17,7 +18,7 @@ output_dir = os.path.join(
 os.makedirs(output_dir, exist_ok=True)
 
 # load audio
-audio, sr = librosa.load(input_path, sr=None)
+audio, sr = load_audio(input_path, sr=None)
 
 # choose random speed factor
 # slow: 0.7–0.9 | fast: 1.1–1.3
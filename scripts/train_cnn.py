@@ -1,17 +1,25 @@
 import os
 import csv
+import time
 import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing as mp
 import numpy as np
 from collections import defaultdict
-from sklearn.metrics import accuracy_score, confusion_matrix, roc_curve
+from scipy import stats
+from sklearn.metrics import accuracy_score, confusion_matrix, roc_curve, precision_recall_fscore_support
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Dense, Dropout, GlobalAveragePooling2D
 from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.utils import Sequence
 from sklearn.model_selection import train_test_split
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE_DIR, "..", "data", "dataset.csv")
 FEATURE_DIR = os.path.join(BASE_DIR, "..", "data", "features")
+CV_STORE_DIR = os.path.join(BASE_DIR, "..", "data", "features_cv")
 
 WINDOW = 40
 HOP = 20
@@ -20,126 +28,322 @@ FILE_THRESH = 0.50   # file-level voting (fixed, correct)
 # -------------------------------------------------
 # STEP 1: LOAD FILE-LEVEL DATA
 # -------------------------------------------------
-files = []
-with open(CSV_PATH, "r") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        name = os.path.splitext(os.path.basename(row["filepath"]))[0]
-        mel = np.load(os.path.join(FEATURE_DIR, name + ".npy"))
-        label = int(row["label"])
-        base = name.replace("del_", "").replace("splice_", "").replace("speed_", "")
-        files.append((base, mel, label))
+def load_files():
+    files = []
+    with open(CSV_PATH, "r") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            name = os.path.splitext(os.path.basename(row["filepath"]))[0]
+            mel = np.load(os.path.join(FEATURE_DIR, name + ".npy"))
+            label = int(row["label"])
+            base = name.replace("del_", "").replace("splice_", "").replace("speed_", "")
+            files.append((base, mel, label, name))
+    return files
 
 # -------------------------------------------------
-# STEP 2: BALANCED FILE-LEVEL SPLIT
+# STEP 3: WINDOWING FUNCTION
 # -------------------------------------------------
-clean_files = [f for f in files if f[2] == 0]
-tamper_files = [f for f in files if f[2] == 1]
-
-random.seed(42)
-random.shuffle(clean_files)
-random.shuffle(tamper_files)
+def window_starts(T):
+    if T < WINDOW:
+        return [None]   # single zero-padded window
+    return list(range(0, T - WINDOW + 1, HOP))
 
-N = min(len(clean_files), len(tamper_files), 5)
 
-test_files = clean_files[:N] + tamper_files[:N]
-train_files = clean_files[N:] + tamper_files[N:]
+def cut_window(mel, start):
+    if start is None:
+        return np.pad(mel, ((0,0),(0, WINDOW-mel.shape[1])))
+    return mel[:, start:start+WINDOW]
 
-print("Train files:", len(train_files))
-print("Test files:", len(test_files))
 
-# -------------------------------------------------
-# STEP 3: WINDOWING FUNCTION
-# -------------------------------------------------
 def make_windows(file_list):
     X, y, bases = [], [], []
-    for base, mel, label in file_list:
-        T = mel.shape[1]
-        if T < WINDOW:
-            win = np.pad(mel, ((0,0),(0, WINDOW-T)))
-            X.append(win)
+    for base, mel, label, _ in file_list:
+        for start in window_starts(mel.shape[1]):
+            X.append(cut_window(mel, start))
             y.append(label)
             bases.append(base)
-        else:
-            for i in range(0, T - WINDOW + 1, HOP):
-                X.append(mel[:, i:i+WINDOW])
-                y.append(label)
-                bases.append(base)
     return np.array(X)[..., np.newaxis], np.array(y), np.array(bases)
 
-X_all, y_all, _ = make_windows(train_files)
-
-# -------------------------------------------------
-# STEP 4: TRAIN / VALIDATION SPLIT (WINDOW LEVEL)
-# -------------------------------------------------
-X_train, X_val, y_train, y_val = train_test_split(
-    X_all, y_all, test_size=0.2, stratify=y_all, random_state=42
-)
-
-print("Train windows:", len(X_train))
-print("Val windows:", len(X_val))
-
 # -------------------------------------------------
 # STEP 5: MODEL
 # -------------------------------------------------
-model = Sequential([
-    Conv2D(32, (3,3), activation="relu", input_shape=(128, WINDOW, 1)),
-    MaxPooling2D((2,2)),
-    Conv2D(64, (3,3), activation="relu"),
-    MaxPooling2D((2,2)),
-    GlobalAveragePooling2D(),
-    Dense(64, activation="relu"),
-    Dropout(0.3),
-    Dense(1, activation="sigmoid")
-])
-
-model.compile(
-    optimizer=Adam(0.0001),
-    loss="binary_crossentropy",
-    metrics=["accuracy"]
-)
-
-model.fit(
-    X_train, y_train,
-    epochs=15,
-    batch_size=32,
-    validation_data=(X_val, y_val),
-    verbose=1
-)
+def build_model():
+    model = Sequential([
+        Conv2D(32, (3,3), activation="relu", input_shape=(128, WINDOW, 1)),
+        MaxPooling2D((2,2)),
+        Conv2D(64, (3,3), activation="relu"),
+        MaxPooling2D((2,2)),
+        GlobalAveragePooling2D(),
+        Dense(64, activation="relu"),
+        Dropout(0.3),
+        Dense(1, activation="sigmoid")
+    ])
+
+    model.compile(
+        optimizer=Adam(0.0001),
+        loss="binary_crossentropy",
+        metrics=["accuracy"]
+    )
+    return model
 
 # -------------------------------------------------
 # STEP 6: AUTO-LEARN WINDOW THRESHOLD (YOUDEN J)
 # -------------------------------------------------
-val_probs = model.predict(X_val).flatten()
-fpr, tpr, thresholds = roc_curve(y_val, val_probs)
-j_scores = tpr - fpr
-best_idx = np.argmax(j_scores)
-WIN_THRESH = thresholds[best_idx]
+def youden_threshold(y_true, probs):
+    fpr, tpr, thresholds = roc_curve(y_true, probs)
+    j_scores = tpr - fpr
+    best_idx = np.argmax(j_scores)
+    return thresholds[best_idx]
+
+
+def train_single_split(epochs=15):
+    files = load_files()
+
+    # -------------------------------------------------
+    # STEP 2: BALANCED FILE-LEVEL SPLIT
+    # -------------------------------------------------
+    clean_files = [f for f in files if f[2] == 0]
+    tamper_files = [f for f in files if f[2] == 1]
+
+    random.seed(42)
+    random.shuffle(clean_files)
+    random.shuffle(tamper_files)
+
+    N = min(len(clean_files), len(tamper_files), 5)
+
+    test_files = clean_files[:N] + tamper_files[:N]
+    train_files = clean_files[N:] + tamper_files[N:]
+
+    print("Train files:", len(train_files))
+    print("Test files:", len(test_files))
+
+    X_all, y_all, _ = make_windows(train_files)
+
+    # -------------------------------------------------
+    # STEP 4: TRAIN / VALIDATION SPLIT (WINDOW LEVEL)
+    # -------------------------------------------------
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_all, y_all, test_size=0.2, stratify=y_all, random_state=42
+    )
+
+    print("Train windows:", len(X_train))
+    print("Val windows:", len(X_val))
+
+    model = build_model()
+
+    model.fit(
+        X_train, y_train,
+        epochs=epochs,
+        batch_size=32,
+        validation_data=(X_val, y_val),
+        verbose=1
+    )
+
+    val_probs = model.predict(X_val).flatten()
+    WIN_THRESH = youden_threshold(y_val, val_probs)
+
+    print(f"\nLearned WIN_THRESH = {WIN_THRESH:.3f}")
+
+    # -------------------------------------------------
+    # STEP 7: FILE-LEVEL EVALUATION
+    # -------------------------------------------------
+    X_test, y_test, base_test = make_windows(test_files)
+
+    file_votes = defaultdict(list)
+    file_gt = {}
+
+    for win, gt, base in zip(X_test, y_test, base_test):
+        prob = model.predict(win[None, ...], verbose=0)[0][0]
+        file_votes[base].append(int(prob > WIN_THRESH))
+        file_gt[base] = gt
+
+    y_file_pred, y_file_true = [], []
+    for b in file_votes:
+        ratio = sum(file_votes[b]) / len(file_votes[b])
+        y_file_pred.append(int(ratio >= FILE_THRESH))
+        y_file_true.append(file_gt[b])
 
-print(f"\nLearned WIN_THRESH = {WIN_THRESH:.3f}")
+    acc = accuracy_score(y_file_true, y_file_pred)
+    cm = confusion_matrix(y_file_true, y_file_pred)
+
+    print("\nFILE-LEVEL Test Accuracy:", acc)
+    print("Confusion Matrix:\n", cm)
+    model.save("model.h5")
 
 # -------------------------------------------------
-# STEP 7: FILE-LEVEL EVALUATION
+# K-FOLD CROSS-VALIDATION
 # -------------------------------------------------
-X_test, y_test, base_test = make_windows(test_files)
+# All windows are written once to a memory-mapped .npy; every fold process
+# maps the same file read-only and gathers batches from it on demand, so the
+# page cache holds a single copy of the features however many folds run.
+
+class MemmapWindows(Sequence):
+    """Batches of windows gathered from a memory-mapped window store"""
+
+    def __init__(self, X, idx, y=None, batch_size=32, shuffle=False, seed=0):
+        super().__init__()
+        self.X, self.idx, self.y = X, np.asarray(idx), y
+        self.batch_size, self.shuffle = batch_size, shuffle
+        self.rng = np.random.default_rng(seed)
+        self.order = self.idx.copy()
+        self.on_epoch_end()
+
+    def __len__(self):
+        return int(np.ceil(len(self.order) / self.batch_size))
+
+    def __getitem__(self, i):
+        batch = np.sort(self.order[i * self.batch_size:(i + 1) * self.batch_size])
+        X = np.asarray(self.X[batch])
+        return X if self.y is None else (X, self.y[batch])
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+
+def build_cv_store(files, store):
+    """Writes every window to the store directory; returns per-file metadata"""
+    counts = [len(window_starts(mel.shape[1])) for _, mel, _, _ in files]
+    X = np.lib.format.open_memmap(
+        os.path.join(store, "windows.npy"), mode="w+",
+        dtype=np.float32, shape=(sum(counts), 128, WINDOW, 1)
+    )
+    file_idx = np.repeat(np.arange(len(files)), counts)
+    pos = 0
+    for (_, mel, _, _), n in zip(files, counts):
+        for start in window_starts(mel.shape[1]):
+            X[pos, ..., 0] = cut_window(mel, start)
+            pos += 1
+    X.flush()
+    del X
+
+    labels = np.array([f[2] for f in files])
+    np.save(os.path.join(store, "file_idx.npy"), file_idx)
+    np.save(os.path.join(store, "labels.npy"), labels[file_idx])
+    return labels, [f[0] for f in files], [f[3] for f in files]
+
+
+def assign_folds(bases, k, seed=42):
+    """Every file of a base clip (clean + its tampered variants) lands in one fold"""
+    uniq = sorted(set(bases))
+    random.Random(seed).shuffle(uniq)
+    fold_of = {b: i % k for i, b in enumerate(uniq)}
+    return np.array([fold_of[b] for b in bases])
+
+
+def run_fold(fold, store, file_folds, threads, epochs):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    tf.keras.utils.set_random_seed(42 + fold)
+
+    X = np.load(os.path.join(store, "windows.npy"), mmap_mode="r")
+    file_idx = np.load(os.path.join(store, "file_idx.npy"))
+    y = np.load(os.path.join(store, "labels.npy"))
+
+    test_mask = file_folds[file_idx] == fold
+    train_idx, val_idx = train_test_split(
+        np.nonzero(~test_mask)[0], test_size=0.2,
+        stratify=y[~test_mask], random_state=42
+    )
+    test_idx = np.nonzero(test_mask)[0]
+
+    model = build_model()
+    model.fit(
+        MemmapWindows(X, train_idx, y, shuffle=True, seed=fold),
+        epochs=epochs,
+        validation_data=MemmapWindows(X, val_idx, y),
+        verbose=0
+    )
+
+    val_probs = model.predict(MemmapWindows(X, val_idx, batch_size=256), verbose=0).flatten()
+    thresh = youden_threshold(y[val_idx], val_probs)
+
+    test_probs = model.predict(MemmapWindows(X, test_idx, batch_size=256), verbose=0).flatten()
+    votes = defaultdict(list)
+    for f, p in zip(file_idx[test_idx], test_probs):
+        votes[int(f)].append(int(p > thresh))
+    ratios = {f: sum(v) / len(v) for f, v in votes.items()}
+
+    print(f"Fold {fold}: WIN_THRESH={thresh:.3f}, {len(ratios)} test files", flush=True)
+    return fold, float(thresh), ratios
+
+
+def mean_ci(values, confidence=0.95):
+    values = np.asarray(values, dtype=float)
+    m = values.mean()
+    if len(values) < 2:
+        return m, m, m
+    h = stats.sem(values) * stats.t.ppf((1 + confidence) / 2, len(values) - 1)
+    return m, m - h, m + h
+
+
+def wilson_ci(successes, n, confidence=0.95):
+    z = stats.norm.ppf((1 + confidence) / 2)
+    p = successes / n
+    denom = 1 + z**2 / n
+    center = (p + z**2 / (2 * n)) / denom
+    h = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denom
+    return center - h, center + h
+
+
+def cross_validate(k, jobs=None, epochs=15):
+    t0 = time.perf_counter()
+    files = load_files()
+    n_bases = len(set(f[0] for f in files))
+    if not 2 <= k <= n_bases:
+        raise ValueError(f"--cv K must be between 2 and the number of base clips ({n_bases}), got {k}")
+
+    # one store per run, so concurrent runs do not overwrite each other's windows
+    os.makedirs(CV_STORE_DIR, exist_ok=True)
+    store = tempfile.mkdtemp(prefix="run_", dir=CV_STORE_DIR)
+    try:
+        labels, bases, names = build_cv_store(files, store)
+        file_folds = assign_folds(bases, k)
+
+        jobs = min(k, jobs or os.cpu_count() or 1)
+        threads = max(1, (os.cpu_count() or 1) // jobs)
+        print(f"{k}-fold CV over {len(files)} files ({n_bases} base clips), "
+              f"{jobs} parallel folds × {threads} threads")
+
+        # spawn: TensorFlow does not survive fork
+        with mp.get_context("spawn").Pool(jobs) as pool:
+            results = pool.starmap(run_fold, [(fold, store, file_folds, threads, epochs) for fold in range(k)])
+    finally:
+        shutil.rmtree(store, ignore_errors=True)
+
+    fold_acc, y_true, y_pred = [], [], []
+    for fold, thresh, ratios in sorted(results):
+        t = [int(labels[f]) for f in ratios]
+        p = [int(r >= FILE_THRESH) for r in ratios.values()]
+        fold_acc.append(accuracy_score(t, p))
+        y_true += t
+        y_pred += p
 
-file_votes = defaultdict(list)
-file_gt = {}
+    acc, lo, hi = mean_ci(fold_acc)
+    correct = sum(int(a == b) for a, b in zip(y_true, y_pred))
+    p_lo, p_hi = wilson_ci(correct, len(y_true))
+    prec, rec, f1, _ = precision_recall_fscore_support(y_true, y_pred, average="binary", zero_division=0)
 
-for win, gt, base in zip(X_test, y_test, base_test):
-    prob = model.predict(win[None, ...], verbose=0)[0][0]
-    file_votes[base].append(int(prob > WIN_THRESH))
-    file_gt[base] = gt
+    print("\nPer-fold FILE-LEVEL accuracy:", " ".join(f"{a:.3f}" for a in fold_acc))
+    print(f"Mean FILE-LEVEL accuracy: {acc:.3f} (95% CI {lo:.3f}–{hi:.3f}, t over {k} folds)")
+    print(f"Pooled FILE-LEVEL accuracy: {correct / len(y_true):.3f} "
+          f"(95% Wilson CI {p_lo:.3f}–{p_hi:.3f}, n={len(y_true)})")
+    print(f"Precision: {prec:.3f}  Recall: {rec:.3f}  F1: {f1:.3f}")
+    print("Confusion Matrix:\n", confusion_matrix(y_true, y_pred))
+    print(f"Wall-clock: {time.perf_counter() - t0:.1f}s")
 
-y_file_pred, y_file_true = [], []
-for b in file_votes:
-    ratio = sum(file_votes[b]) / len(file_votes[b])
-    y_file_pred.append(int(ratio >= FILE_THRESH))
-    y_file_true.append(file_gt[b])
 
-acc = accuracy_score(y_file_true, y_file_pred)
-cm = confusion_matrix(y_file_true, y_file_pred)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the window CNN")
+    parser.add_argument("--cv", type=int, metavar="K", help="run K-fold cross-validation instead of a single split")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel fold processes (default: cores)")
+    parser.add_argument("--epochs", type=int, default=15)
+    args = parser.parse_args()
 
-print("\nFILE-LEVEL Test Accuracy:", acc)
-print("Confusion Matrix:\n", cm)
-model.save("model.h5")
+    if args.cv is not None and args.cv < 2:
+        parser.error("--cv K needs K >= 2")
+    if args.cv:
+        cross_validate(args.cv, args.jobs, args.epochs)
+    else:
+        train_single_split(args.epochs)
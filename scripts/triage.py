@@ -0,0 +1,215 @@
+import os
+import csv
+import time
+import argparse
+import numpy as np
+
+from audio_io import AUDIO_EXTS
+from extract_mel_features import extract_mel, SR, HOP_LENGTH
+from model_tiers import select_tier, triage_tier, resolve
+
+# Must match app.py
+WIN_THRESH = 0.695
+FILE_THRESH = 0.50
+WINDOW = 40
+HOP = 20
+
+# Sequential test on the tampered-window rate p:
+#   H0 (CLEAN):    p = FILE_THRESH - DELTA
+#   H1 (TAMPERED): p = FILE_THRESH + DELTA
+# ALPHA bounds the CLEAN→TAMPERED error, BETA the TAMPERED→CLEAN error.
+ALPHA = 0.01
+BETA = 0.01
+DELTA = 0.15
+STRATA = 4        # windows are drawn round-robin from this many time blocks
+BATCH = 8         # windows per model call
+
+# -------------------------------------------------
+# WINDOW SCORING
+# -------------------------------------------------
+def window_batch(mel, starts):
+    T = mel.shape[1]
+    if T < WINDOW:
+        return np.pad(mel, ((0, 0), (0, WINDOW - T)))[None, ..., None]
+    return np.stack([mel[:, s:s + WINDOW] for s in starts])[..., None]
+
+
+def all_starts(T):
+    return np.arange(0, T - WINDOW + 1, HOP) if T >= WINDOW else np.array([0])
+
+
+def stratified_order(n, rng, strata=STRATA):
+    """Random order that visits every time block early (round-robin over blocks)"""
+    blocks = [rng.permutation(b) for b in np.array_split(np.arange(n), min(strata, n))]
+    order = []
+    for i in range(max(len(b) for b in blocks)):
+        order += [int(b[i]) for b in blocks if i < len(b)]
+    return np.array(order)
+
+
+def score(model, mel, starts):
+    return np.asarray(model(window_batch(mel, starts), training=False))[:, 0]
+
+# -------------------------------------------------
+# SEQUENTIAL PROBABILITY RATIO TEST
+# -------------------------------------------------
+class Sprt:
+    def __init__(self, alpha=ALPHA, beta=BETA, delta=DELTA, center=FILE_THRESH):
+        p0 = max(center - delta, 1e-6)
+        p1 = min(center + delta, 1 - 1e-6)
+        self.step_hit = np.log(p1 / p0)
+        self.step_miss = np.log((1 - p1) / (1 - p0))
+        self.upper = np.log((1 - beta) / alpha)   # accept H1 (TAMPERED)
+        self.lower = np.log(beta / (1 - alpha))   # accept H0 (CLEAN)
+        self.llr = 0.0
+
+    def update(self, vote):
+        self.llr += self.step_hit if vote else self.step_miss
+        if self.llr >= self.upper:
+            return "TAMPERED"
+        if self.llr <= self.lower:
+            return "CLEAN"
+        return None
+
+    def confidence(self, verdict):
+        # posterior of the chosen hypothesis under equal priors
+        p_tampered = 1.0 / (1.0 + np.exp(-self.llr))
+        return p_tampered if verdict == "TAMPERED" else 1.0 - p_tampered
+
+
+def triage_mel(model, mel, rng, alpha=ALPHA, beta=BETA, delta=DELTA, localize=True,
+               win_thresh=WIN_THRESH):
+    """
+    Scores windows in stratified random order until the SPRT decides, then
+    (for TAMPERED files, if localize) scores the remaining windows too.
+    """
+    starts = all_starts(mel.shape[1])
+    order = stratified_order(len(starts), rng)
+    test = Sprt(alpha, beta, delta)
+    scores = np.full(len(starts), np.nan)
+
+    verdict, used = None, 0
+    for b in range(0, len(order), BATCH):
+        idx = order[b:b + BATCH]
+        scores[idx] = score(model, mel, starts[idx])
+        for i in idx:
+            used += 1
+            verdict = test.update(scores[i] > win_thresh)
+            if verdict:
+                break
+        if verdict:
+            break
+
+    scored = int(np.count_nonzero(~np.isnan(scores)))
+    evaluated = scores[order[:used]]
+    result = {
+        "windows_total": len(starts),
+        "windows_evaluated": used,
+        "windows_scored": scored,
+        "ratio": float(np.mean(evaluated > win_thresh)),
+    }
+
+    if verdict is None:
+        # ran out of windows: every window has been seen, decide exactly
+        verdict = "TAMPERED" if result["ratio"] >= FILE_THRESH else "CLEAN"
+        result.update(verdict=verdict, confidence=1.0, sequential=False)
+    else:
+        result.update(verdict=verdict, confidence=float(test.confidence(verdict)), sequential=True)
+
+    if verdict == "TAMPERED" and localize:
+        rest = np.nonzero(np.isnan(scores))[0]
+        for b in range(0, len(rest), BATCH):
+            idx = rest[b:b + BATCH]
+            scores[idx] = score(model, mel, starts[idx])
+        result["windows_scored"] = len(starts)
+        result["full_ratio"] = float(np.mean(scores > win_thresh))
+        result["full_verdict"] = "TAMPERED" if result["full_ratio"] >= FILE_THRESH else "CLEAN"
+        result["regions"] = tampered_regions(starts, scores, win_thresh)
+    return result
+
+
+def tampered_regions(starts, scores, win_thresh=WIN_THRESH):
+    """Merges overlapping flagged windows into (start_s, end_s) intervals"""
+    regions = []
+    to_sec = HOP_LENGTH / SR
+    for s, p in zip(starts, scores):
+        if p <= win_thresh:
+            continue
+        t0, t1 = s * to_sec, (s + WINDOW) * to_sec
+        if regions and t0 <= regions[-1][1]:
+            regions[-1][1] = t1
+        else:
+            regions.append([t0, t1])
+    return [(round(a, 2), round(b, 2)) for a, b in regions]
+
+# -------------------------------------------------
+# BATCH SCANNER
+# -------------------------------------------------
+def collect(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for dirpath, _, filenames in sorted(os.walk(p)):
+                files += [os.path.join(dirpath, f) for f in sorted(filenames) if f.lower().endswith(AUDIO_EXTS)]
+        else:
+            files.append(p)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential early-stopping triage of audio archives")
+    parser.add_argument("paths", nargs="+", help="audio files or directories")
+    tier_opt = parser.add_mutually_exclusive_group()
+    tier_opt.add_argument("--latency-budget", type=float, metavar="MS",
+                          help=f"pick the most accurate model tier within this per-window latency (batch {BATCH})")
+    tier_opt.add_argument("--triage-tier", action="store_true",
+                          help="use the fast tier flagged for high-volume triage")
+    parser.add_argument("--alpha", type=float, default=ALPHA, help="max P(TAMPERED | clean)")
+    parser.add_argument("--beta", type=float, default=BETA, help="max P(CLEAN | tampered)")
+    parser.add_argument("--delta", type=float, default=DELTA, help="indifference half-width around FILE_THRESH")
+    parser.add_argument("--no-localize", action="store_true", help="skip the full scan of flagged files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="triage.csv")
+    args = parser.parse_args()
+
+    if args.triage_tier:
+        tier = triage_tier(batch_size=BATCH)
+    else:
+        tier = select_tier(args.latency_budget, batch_size=BATCH)
+    print(f"Model tier: {tier['name']} ({tier['path']}, WIN_THRESH={tier['win_thresh']:.3f})")
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(resolve(tier))
+    rng = np.random.default_rng(args.seed)
+
+    files = collect(args.paths)
+    t0 = time.perf_counter()
+    total_windows = scored_windows = flagged = 0
+
+    with open(args.out, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filepath", "verdict", "confidence", "windows_evaluated", "windows_total",
+                         "ratio", "full_verdict", "full_ratio", "regions"])
+        for i, path in enumerate(files, start=1):
+            r = triage_mel(model, extract_mel(path), rng, args.alpha, args.beta, args.delta,
+                           localize=not args.no_localize, win_thresh=tier["win_thresh"])
+            total_windows += r["windows_total"]
+            scored_windows += r["windows_scored"]
+            flagged += r["verdict"] == "TAMPERED"
+            writer.writerow([path, r["verdict"], f"{r['confidence']:.4f}", r["windows_evaluated"],
+                             r["windows_total"], f"{r['ratio']:.3f}", r.get("full_verdict", ""),
+                             f"{r['full_ratio']:.3f}" if "full_ratio" in r else "",
+                             " ".join(f"{a}-{b}" for a, b in r.get("regions", []))])
+            print(f"[{i}/{len(files)}] {r['verdict']:<8} conf={r['confidence']:.3f} "
+                  f"windows={r['windows_evaluated']}/{r['windows_total']}  {os.path.basename(path)}")
+
+    elapsed = time.perf_counter() - t0
+    print(f"\n✔ {len(files)} files in {elapsed:.1f}s, {flagged} flagged")
+    if total_windows:
+        print(f"Windows scored: {scored_windows}/{total_windows} "
+              f"({scored_windows / total_windows:.1%} of a full scan)")
+    print("Results written to", args.out)
+
+
+if __name__ == "__main__":
+    main()